@@ -0,0 +1,128 @@
+"""
+Generator of synthetic ImageNet files in the format read by 'flask load-db', at a configurable scale.
+The defaults match the full fall 2011 release: 82115 synsets, of which about a quarter have images, and 14197122 images.
+The is-a hierarchy is grown by preferential attachment, so that the fan-out is heavy-tailed as in WordNet, a few synsets
+having hundreds of hyponyms and most having none, and a small share of the synsets have a second parent.
+The images are spread over the leaves and a few inner synsets with log-normally distributed counts,
+and their URLs are spread over a few dozen hosts, mostly Flickr farms.
+The files are written line by line, so generating the full scale takes a few minutes but little memory.
+
+python benchmarks/generate_dataset.py DIRECTORY [--synsets N] [--images N] [--seed N]
+"""
+import argparse
+import os
+import random
+from time import perf_counter
+
+ROOT_WNID = "n00001740"
+SECOND_PARENT_SHARE = 0.02
+IMAGE_SYNSET_SHARE = 0.27
+SYLLABLES = ["ka", "lo", "mi", "ra", "den", "tor", "vel", "sin", "pa", "gru", "hel", "mon", "ti", "quo", "ber", "nal", "os", "fi"]
+HOSTS = ["farm{}.static.flickr.com".format(i) for i in range(1, 10)] + ["static.flickr.com"] + [
+    "www.{}.com".format(name) for name in ["pbase", "photobucket", "webshots", "fotopedia", "zooborns", "animalpicturesarchive"]
+] + ["img{}.imageshack.us".format(i) for i in range(100, 120)]
+HOST_WEIGHTS = [20] * 9 + [10] + [2] * 6 + [1] * 20
+
+def get_wnid(index):
+    """
+    Return the WordNet ID of the synset with the given index, the first being the root of the hierarchy.
+    """
+    return ROOT_WNID if index == 0 else "n{:08d}".format(10000000 + index)
+
+def get_word(rng):
+    """
+    Return a random pronounceable word.
+    """
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def generate_hierarchy(rng, synset_count):
+    """
+    Return the (parent index, child index) edges of a random hierarchy of the given number of synsets grown by preferential attachment.
+    Each new synset picks its parent with a probability proportional to one more than the number of hyponyms the parent already has.
+    """
+    edges = []
+    weighted = [0]
+    for index in range(1, synset_count):
+        parent = rng.choice(weighted)
+        edges.append((parent, index))
+        weighted.append(parent)
+        if index > 1 and rng.random() < SECOND_PARENT_SHARE:
+            second = rng.choice(weighted)
+            if second != parent and second != index:
+                edges.append((second, index))
+                weighted.append(second)
+        weighted.append(index)
+    return edges
+
+def generate_image_counts(rng, synset_count, edges, image_count):
+    """
+    Return a dictionary of the number of images keyed by the synset index, the counts adding up to the given number of images.
+    Leaves are chosen before inner synsets, and the counts are drawn from a log-normal distribution.
+    """
+    inner = set(parent for parent, _ in edges)
+    leaves = [index for index in range(synset_count) if index not in inner]
+    rng.shuffle(leaves)
+    chosen = leaves[:max(1, int(synset_count * IMAGE_SYNSET_SHARE))]
+    if len(chosen) < synset_count * IMAGE_SYNSET_SHARE:
+        chosen.extend(rng.sample(sorted(inner), min(len(inner), int(synset_count * IMAGE_SYNSET_SHARE) - len(chosen))))
+
+    weights = [rng.lognormvariate(0, 0.8) for _ in chosen]
+    scale = image_count / sum(weights)
+    counts = dict((index, int(weight * scale)) for index, weight in zip(chosen, weights))
+    remainder = image_count - sum(counts.values())
+    for index in chosen[:remainder]:
+        counts[index] += 1
+    return counts
+
+def generate(directory, synset_count=82115, image_count=14197122, seed=0):
+    """
+    Write words.txt, gloss.txt, wordnet.is_a.txt, and fall11_urls.txt of the given scale into the directory.
+    The same seed always generates the same files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "words.txt"), "w") as words_file, open(os.path.join(directory, "gloss.txt"), "w") as gloss_file:
+        for index in range(synset_count):
+            wnid = get_wnid(index)
+            words = ", ".join(" ".join(get_word(rng) for _ in range(rng.randint(1, 2))) for _ in range(rng.randint(1, 4)))
+            gloss = " ".join(get_word(rng) for _ in range(rng.randint(5, 20)))
+            words_file.write("{}\t{}\n".format(wnid, words))
+            gloss_file.write("{}\t{}\n".format(wnid, gloss))
+
+    edges = generate_hierarchy(rng, synset_count)
+    with open(os.path.join(directory, "wordnet.is_a.txt"), "w") as hyponyms_file:
+        for parent, child in edges:
+            hyponyms_file.write("{} {}\n".format(get_wnid(parent), get_wnid(child)))
+
+    counts = generate_image_counts(rng, synset_count, edges, image_count)
+    hosts = rng.choices(HOSTS, HOST_WEIGHTS, k=4096)
+    with open(os.path.join(directory, "fall11_urls.txt"), "w", encoding="iso-8859-1") as urls_file:
+        for index in sorted(counts):
+            wnid = get_wnid(index)
+            lines = []
+            for imid in range(1, counts[index] + 1):
+                number = rng.getrandbits(64)
+                lines.append("{}_{}\thttp://{}/{}/{}_{:010x}.jpg\n".format(
+                    wnid, imid, hosts[number & 4095], (number >> 12) % 9000 + 1000, (number >> 24) % 4000000000, number >> 24
+                ))
+            urls_file.writelines(lines)
+
+    return len(edges)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="directory the files are written into")
+    parser.add_argument("--synsets", type=int, default=82115, help="number of synsets")
+    parser.add_argument("--images", type=int, default=14197122, help="number of images")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    args = parser.parse_args()
+
+    time_start = perf_counter()
+    edge_count = generate(args.directory, args.synsets, args.images, args.seed)
+    print("Generated {} synsets, {} hyponyms, and {} images into '{}' in {:.1f} s".format(
+        args.synsets, edge_count, args.images, args.directory, perf_counter() - time_start
+    ))
+
+if __name__ == "__main__":
+    main()
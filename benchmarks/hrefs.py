@@ -0,0 +1,39 @@
+"""
+Benchmark of building the hrefs of a page of items with url_for and with a HrefBuilder that uses the precomputed href templates.
+
+python benchmarks/hrefs.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import url_for
+from imagenet_browser import create_app
+from imagenet_browser.constants import *
+from imagenet_browser.utils import HrefBuilder
+
+def build_page(build):
+    """
+    Build the self and synset hrefs of a page of images as the image collection does.
+    """
+    for imid in range(IMAGE_PAGE_SIZE):
+        build("api.synsetimageitem", wnid="n02103406", imid=imid)
+        build("api.synsetitem", wnid="n02103406")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="pages per timing round")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+    with app.test_request_context():
+        print("{:<12} {:>12}".format("builder", "page (us)"))
+        for name, build in [("url_for", lambda: url_for), ("HrefBuilder", HrefBuilder)]:
+            page = min(repeat(lambda: build_page(build()), number=args.repeat, repeat=5)) / args.repeat * 1e6
+            print("{:<12} {:>12.1f}".format(name, page))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the JSON serializers for hypermedia responses on full collection pages.
+A temporary database is populated with enough synsets and images to fill a page of the synset and image collections,
+after which each available serializer is timed both on its own and as part of a whole GET request through the test client.
+
+python benchmarks/serialization.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from timeit import repeat
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from imagenet_browser import create_app, db
+from imagenet_browser.constants import *
+from imagenet_browser.models import Synset, Image, rebuild_image_counts, rebuild_row_counts, rebuild_synset_closure
+from imagenet_browser.utils import JSON_SERIALIZERS, serialize_json
+
+URLS = ["/api/synsets/", "/api/images/"]
+
+def populate_db():
+    """
+    Populate the database with a page and a half of synsets, each having an image.
+    """
+    count = max(SYNSET_PAGE_SIZE, IMAGE_PAGE_SIZE) * 3 // 2
+    for i in range(count):
+        synset = Synset(
+            wnid="n{:08d}".format(i),
+            words="synset {}, synonym {}".format(i, i),
+            gloss="the gloss of the synset {} that is about as long as an average gloss in WordNet".format(i)
+        )
+        db.session.add(Image(imid=i, url="http://farm3.static.flickr.com/{}/{}.jpg".format(i, i), date="2011-01-01", synset=synset))
+    db.session.commit()
+    rebuild_synset_closure(db.session)
+    rebuild_image_counts(db.session)
+    rebuild_row_counts(db.session)
+    db.session.commit()
+
+def best_of(function, number, repeat_count):
+    """
+    Return the best time per call of the function in microseconds.
+    """
+    return min(repeat(function, number=number, repeat=repeat_count)) / number * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per timing round")
+    args = parser.parse_args()
+
+    db_fd, db_fname = tempfile.mkstemp()
+    try:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_fname, "TESTING": True})
+        with app.app_context():
+            db.create_all()
+            populate_db()
+
+        client = app.test_client()
+        print("{:<16} {:<10} {:>12} {:>12}".format("URL", "serializer", "dumps (us)", "GET (us)"))
+        for url in URLS:
+            app.config["JSON_SERIALIZER"] = "json"
+            body = client.get(url).get_json()
+            for name in JSON_SERIALIZERS:
+                app.config["JSON_SERIALIZER"] = name
+                with app.app_context():
+                    dumps = best_of(lambda: serialize_json(body), args.repeat, 5)
+                get = best_of(lambda: client.get(url), max(args.repeat // 10, 1), 5)
+                print("{:<16} {:<10} {:>12.1f} {:>12.1f}".format(url, name, dumps, get))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_fname)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark suite timing 'flask load-db' and the most used GET requests on a dataset of a realistic scale.
+The ImageNet files are read from the given directory, or generated into a temporary directory at the given scale,
+and loaded into a temporary database, after which each request is timed through the test client with the response cache disabled.
+The requests cover the first and a deep page of the synset and image collections, both by offset and by cursor,
+the hyponym listing of the synset with the most hyponyms, and synset and image items.
+The results are written as JSON along with the commit and the scale they were measured at, and can be compared against an earlier run.
+
+python benchmarks/suite.py [--directory DIR | --synsets N --images N] [--repeat N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import func, select
+from imagenet_browser import create_app, db
+from imagenet_browser.constants import *
+from imagenet_browser.models import Synset, Image, hyponyms
+from generate_dataset import generate
+
+def get_commit():
+    """
+    Return the hash of the checked out commit, or None if it cannot be determined.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def get_requests(app):
+    """
+    Return the (name, URL) pairs of the requests to time, picking the synsets and the deep pages from the loaded database.
+    """
+    with app.app_context():
+        synset_count = db.session.execute(select(func.count()).select_from(Synset)).scalar()
+        image_count = db.session.execute(select(func.count()).select_from(Image)).scalar()
+        wnid_widest = db.session.execute(
+            select(hyponyms.c.synset_wnid).group_by(hyponyms.c.synset_wnid).order_by(func.count().desc()).limit(1)
+        ).scalar()
+        image = db.session.execute(select(Image.synset_wnid, Image.imid).order_by(Image.synset_wnid.desc()).limit(1)).first()
+
+    client = app.test_client()
+    synset_deep = max(synset_count - SYNSET_PAGE_SIZE, 0)
+    image_deep = max(image_count - IMAGE_PAGE_SIZE, 0)
+    synset_cursor = json.loads(client.get("/api/synsets/?start={}".format(max(synset_deep - SYNSET_PAGE_SIZE, 0))).data)
+    image_cursor = json.loads(client.get("/api/images/?start={}".format(max(image_deep - IMAGE_PAGE_SIZE, 0))).data)
+
+    requests = [
+        ("synset collection first page", "/api/synsets/"),
+        ("synset collection deep offset", "/api/synsets/?start={}".format(synset_deep)),
+        ("image collection first page", "/api/images/"),
+        ("image collection deep offset", "/api/images/?start={}".format(image_deep)),
+        ("hyponym collection widest", "/api/synsets/{}/hyponyms/".format(wnid_widest)),
+        ("synset item", "/api/synsets/{}/".format(wnid_widest)),
+        ("synset image item", "/api/synsets/{}/images/{}/".format(*image))
+    ]
+    for name, body in [("synset collection deep cursor", synset_cursor), ("image collection deep cursor", image_cursor)]:
+        if "next" in body["@controls"]:
+            requests.append((name, body["@controls"]["next"]["href"]))
+    return requests
+
+def time_request(client, url, repeat):
+    """
+    Return the minimum, median, and 95th percentile times of the GET request in microseconds, after a warm-up request.
+    """
+    assert client.get(url).status_code == 200, url
+    times = []
+    for _ in range(repeat):
+        time_start = perf_counter()
+        client.get(url)
+        times.append((perf_counter() - time_start) * 1e6)
+    times.sort()
+    return {"min": times[0], "median": statistics.median(times), "p95": times[min(len(times) - 1, int(len(times) * 0.95))]}
+
+def run(directory, repeat):
+    """
+    Load the ImageNet files in the directory into a temporary database and time load-db and the requests.
+    Return the results as a dictionary.
+    """
+    db_fd, db_fname = tempfile.mkstemp()
+    try:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_fname, "TESTING": True})
+        with app.app_context():
+            db.create_all()
+
+        time_start = perf_counter()
+        result = app.test_cli_runner().invoke(args=["load-db", "--directory", directory])
+        load_time = perf_counter() - time_start
+        if result.exit_code != 0:
+            raise RuntimeError(result.output)
+
+        client = app.test_client()
+        results = {"load-db": {"seconds": load_time}}
+        for name, url in get_requests(app):
+            results[name] = dict(time_request(client, url, repeat), url=url)
+            print("{:<32} {:>12.1f} {:>12.1f} {:>12.1f}".format(name, results[name]["min"], results[name]["median"], results[name]["p95"]))
+        print("{:<32} {:>12.1f} s".format("load-db", load_time))
+
+        with app.app_context():
+            scale = {
+                "synsets": db.session.execute(select(func.count()).select_from(Synset)).scalar(),
+                "hyponyms": db.session.execute(select(func.count()).select_from(hyponyms)).scalar(),
+                "images": db.session.execute(select(func.count()).select_from(Image)).scalar()
+            }
+            db.engine.dispose()
+        return {"scale": scale, "results": results}
+    finally:
+        os.close(db_fd)
+        os.unlink(db_fname)
+
+def compare(old, new):
+    """
+    Print the median times, or the load time, of the new run relative to the old run for the benchmarks found in both.
+    """
+    if old["scale"] != new["scale"]:
+        print("Warning: the scale {} of the old run differs from the scale {} of the new run".format(old["scale"], new["scale"]))
+    print("{:<32} {:>12} {:>12} {:>8}".format("compared to " + str(old.get("commit"))[:8], "old", "new", "ratio"))
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        key = "seconds" if name == "load-db" else "median"
+        old_value, new_value = old["results"][name][key], result[key]
+        print("{:<32} {:>12.1f} {:>12.1f} {:>8.2f}".format(name, old_value, new_value, new_value / old_value if old_value else float("inf")))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--directory", help="directory containing the ImageNet files, generated if not given")
+    parser.add_argument("--synsets", type=int, default=8000, help="number of synsets to generate")
+    parser.add_argument("--images", type=int, default=200000, help="number of images to generate")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated files")
+    parser.add_argument("--repeat", type=int, default=50, help="timed requests per benchmark")
+    parser.add_argument("--output", help="file the results are written into as JSON")
+    parser.add_argument("--compare", help="file of earlier results to compare against")
+    args = parser.parse_args()
+
+    print("{:<32} {:>12} {:>12} {:>12}".format("benchmark", "min (us)", "median (us)", "p95 (us)"))
+    if args.directory:
+        run_results = run(args.directory, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            generate(directory, args.synsets, args.images, args.seed)
+            run_results = run(directory, args.repeat)
+
+    output = {
+        "commit": get_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "repeat": args.repeat
+    }
+    output.update(run_results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(output, output_file, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as compare_file:
+            compare(json.load(compare_file), output)
+
+if __name__ == "__main__":
+    main()
@@ -155,6 +155,7 @@ If the current href is different to the one in the control, update it and prev_h
 As a generic hypermedia client, the functionality is dependent on correct and consistent hypermedia controls and the connectedness principle.
 As such, very little application state is needed to be upheld by the client, namely prev_href,
 as it is needed when href points to a resource that has become invalid due to the previous action modifying or deleting it.
+Responses having an ETag are kept in a cache and revalidated using If-None-Match, so unchanged resources are not transferred again.
 Viewing the API state diagram makes understanding the menu hierarchy quick:
 https://raw.githubusercontent.com/wiki/atheik/imagenet-browser/ImageNet_Browser_State.png
 """
@@ -163,13 +164,20 @@ if __name__ == "__main__":
         print("Press the interrupt key (normally Control-C or Delete) to exit")
         with requests.Session() as s:
             href = prev_href = "/api/"
+            cache = {}
             while True:
+                headers = {"If-None-Match": cache[href].headers["ETag"]} if href in cache else {}
                 try:
-                    resp = s.get(API_URL + href)
+                    resp = s.get(API_URL + href, headers=headers)
                 except requests.ConnectionError:
                     print("Connection error occurred")
                     continue
 
+                if resp.status_code == 304:
+                    resp = cache[href]
+                elif "ETag" in resp.headers:
+                    cache[href] = resp
+
                 try:
                     resp.raise_for_status()
                 except requests.HTTPError:
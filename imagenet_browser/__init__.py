@@ -1,6 +1,6 @@
 import os
-import json
-from flask import Flask, Response, url_for
+from threading import Lock
+from flask import Flask, Response
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.engine import Engine
 from sqlalchemy import event
@@ -17,14 +17,34 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.close()
 
+def get_sqlite_pragma_listener(pragmas):
+    """
+    Return a listener for the connect event of an engine that sets the given pragmas on every new SQLite connection.
+    The pragmas are set in the order they are given, and as such journal_mode should come before those that depend on it.
+    """
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute("PRAGMA {}={}".format(pragma, value))
+        cursor.close()
+    return set_sqlite_pragmas
+
 # Based on http://flask.pocoo.org/docs/1.0/tutorial/factory/#the-application-factory
 # Modified to use Flask SQLAlchemy
 def create_app(test_config=None):
     """
     The application factory.
     Create and initialize the Flask application using either the passed configuration or 'config.py' if available.
-    Register Click commands for 'flask' command line invocation used for initial database creation and loading.
+    Register Click commands for 'flask' command line invocation used for initial database creation and loading, and for exporting snapshots.
+    Set the pragmas of the configured SQLite connection profile, along with any extra pragmas, on every new database connection,
+    and create the lock that serializes the writes of the application.
+    Instrument the queries of each request unless disabled, reporting them in the Server-Timing header and warning about those over the query budget.
+    Record the metrics of each request and register the view exporting them for Prometheus, unless disabled.
+    Install the middleware profiling the requests that carry the secret header or are sampled, if enabled.
     Register a blueprint for view grouping.
+    Compile the validators of the model schemas so that the first requests do not pay for it.
+    Create the response cache if it is enabled by giving it a positive size in bytes.
+    Build the hierarchy snapshot and the word index up front if so configured, rather than when it is first used.
     Register link relations, profile, and entry point views.
     Return the application.
     """
@@ -32,7 +52,21 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY="dev",
         SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(app.instance_path, "development.db"),
-        SQLALCHEMY_TRACK_MODIFICATIONS=False
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        HIERARCHY_SNAPSHOT_PRELOAD=False,
+        WORD_INDEX_PRELOAD=False,
+        JSON_SERIALIZER=None,
+        RESPONSE_CACHE_MAX_BYTES=0,
+        SQLITE_PROFILE="default",
+        SQLITE_PRAGMAS={},
+        QUERY_INSTRUMENTATION=True,
+        QUERY_BUDGET=10,
+        QUERY_BUDGETS={"api.synsetitem": 15, "api.synsetimagebulk": None, "api.imagebulk": None},
+        METRICS=True,
+        PROFILING=False,
+        PROFILING_SECRET=None,
+        PROFILING_SAMPLE_RATE=0.0,
+        PROFILING_DIR=None
     )
 
     if not test_config: # pragma: no cover
@@ -47,12 +81,51 @@ def create_app(test_config=None):
 
     db.init_app(app)
 
+    pragmas = dict(SQLITE_PROFILES[app.config["SQLITE_PROFILE"]], **app.config["SQLITE_PRAGMAS"])
+    if pragmas:
+        with app.app_context():
+            event.listen(db.engine, "connect", get_sqlite_pragma_listener(pragmas))
+    app.extensions["write_lock"] = Lock()
+
+    if app.config["QUERY_INSTRUMENTATION"]:
+        from . import instrumentation
+        instrumentation.init_app(app)
+
+    if app.config["METRICS"]:
+        from . import metrics
+        metrics.init_app(app)
+
+    if app.config["PROFILING"]:
+        from . import profiling
+        profiling.init_app(app)
+
     from . import models
     from . import api
+    from . import snapshot
     app.cli.add_command(models.init_db_command)
     app.cli.add_command(models.load_db_command)
+    app.cli.add_command(snapshot.export_snapshot_command)
     app.register_blueprint(api.api_bp)
 
+    models.Synset.get_validator()
+    models.Synset.get_validator(wnid_only=True)
+    models.Image.get_validator()
+    models.Image.get_validator(with_wnid=True)
+
+    if app.config["RESPONSE_CACHE_MAX_BYTES"]:
+        from . import cache
+        app.extensions["response_cache"] = cache.ResponseCache(app.config["RESPONSE_CACHE_MAX_BYTES"])
+
+    if app.config["HIERARCHY_SNAPSHOT_PRELOAD"]: # pragma: no cover
+        from . import hierarchy
+        with app.app_context():
+            hierarchy.get_hierarchy_snapshot()
+
+    if app.config["WORD_INDEX_PRELOAD"]: # pragma: no cover
+        from . import autocomplete
+        with app.app_context():
+            autocomplete.get_word_index()
+
     @app.route(LINK_RELATIONS_URL)
     def send_link_relations():
         """
@@ -80,9 +153,9 @@ def create_app(test_config=None):
         body = utils.ImagenetBrowserBuilder()
 
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("imagenet_browser:synsetcollection", url_for("api.synsetcollection"))
-        body.add_control("imagenet_browser:imagecollection", url_for("api.imagecollection"))
+        body.add_control("imagenet_browser:synsetcollection", utils.href_for("api.synsetcollection"))
+        body.add_control("imagenet_browser:imagecollection", utils.href_for("api.imagecollection"))
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(utils.serialize_json(body), 200, mimetype=MASON)
 
     return app
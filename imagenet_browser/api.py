@@ -1,8 +1,13 @@
 from flask import Blueprint
 from flask_restful import Api
 
-from imagenet_browser.resources.synset import SynsetCollection, SynsetItem, SynsetHyponymCollection, SynsetHyponymItem
-from imagenet_browser.resources.image import SynsetImageCollection, ImageCollection, SynsetImageItem
+from imagenet_browser.resources.synset import (
+    SynsetCollection, SynsetAutocomplete, SynsetItem, SynsetHyponymCollection, SynsetHyponymItem, SynsetDescendantCollection, SynsetAncestorCollection,
+    SynsetPath, SynsetLowestCommonAncestor
+)
+from imagenet_browser.resources.image import (
+    SynsetImageCollection, ImageCollection, SynsetImageItem, SynsetSubtreeImageCollection, SynsetImageBulk, ImageBulk, ImageExport
+)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 api = Api(api_bp)
@@ -11,21 +16,39 @@ api = Api(api_bp)
 Add routes to the resource classes.
 """
 api.add_resource(SynsetCollection, "/synsets/")
+api.add_resource(SynsetAutocomplete, "/synsets/autocomplete/")
 api.add_resource(SynsetItem, "/synsets/<wnid>/")
 api.add_resource(SynsetHyponymCollection, "/synsets/<wnid>/hyponyms/")
 api.add_resource(SynsetHyponymItem, "/synsets/<wnid>/hyponyms/<hyponym_wnid>/")
+api.add_resource(SynsetDescendantCollection, "/synsets/<wnid>/descendants/")
+api.add_resource(SynsetAncestorCollection, "/synsets/<wnid>/ancestors/")
+api.add_resource(SynsetPath, "/synsets/<wnid>/path/")
+api.add_resource(SynsetLowestCommonAncestor, "/synsets/<wnid>/lca/<other_wnid>/")
 api.add_resource(SynsetImageCollection, "/synsets/<wnid>/images/")
+api.add_resource(SynsetImageBulk, "/synsets/<wnid>/images/bulk/")
 api.add_resource(SynsetImageItem, "/synsets/<wnid>/images/<imid>/")
+api.add_resource(SynsetSubtreeImageCollection, "/synsets/<wnid>/subtree-images/")
 api.add_resource(ImageCollection, "/images/")
+api.add_resource(ImageBulk, "/images/bulk/")
+api.add_resource(ImageExport, "/images/export/")
 
 '''
-Resource                  GET POST PUT DELETE URI
------------------------------------------------------------------------------------
-synset collection         X   X               /api/synsets/
-synset item               X        X   X      /api/synsets/<wnid>/
-synset hyponym collection X   X               /api/synsets/<wnid>/hyponyms/
-synset hyponym item       X            X      /api/synsets/<wnid>/hyponyms/<hyponym_wnid>/
-synset image collection   X   X               /api/synsets/<wnid>/images/
-synset image item         X        X   X      /api/synsets/<wnid>/images/<imid>/
-image collection          X                   /api/images/
+Resource                        GET POST PUT DELETE URI
+-----------------------------------------------------------------------------------------------
+synset collection               X   X               /api/synsets/
+synset autocomplete             X                   /api/synsets/autocomplete/?prefix=<prefix>
+synset item                     X        X   X      /api/synsets/<wnid>/
+synset hyponym collection       X   X               /api/synsets/<wnid>/hyponyms/
+synset hyponym item             X            X      /api/synsets/<wnid>/hyponyms/<hyponym_wnid>/
+synset descendant collection    X                   /api/synsets/<wnid>/descendants/
+synset ancestor collection      X                   /api/synsets/<wnid>/ancestors/
+synset path                     X                   /api/synsets/<wnid>/path/
+synset lowest common ancestor   X                   /api/synsets/<wnid>/lca/<other_wnid>/
+synset image collection         X   X               /api/synsets/<wnid>/images/
+synset image bulk                   X               /api/synsets/<wnid>/images/bulk/
+synset image item               X        X   X      /api/synsets/<wnid>/images/<imid>/
+synset subtree image collection X                   /api/synsets/<wnid>/subtree-images/
+image collection                X                   /api/images/
+image bulk                          X               /api/images/bulk/
+image export                    X                   /api/images/export/?format=<ndjson|csv>
 '''
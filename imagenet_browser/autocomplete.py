@@ -0,0 +1,138 @@
+"""
+An in-memory index of the individual word phrases of the synsets for prefix autocompletion,
+built from the database and patched by the synset handlers of the process, and rebuilt when another process changes the synsets.
+The phrases are kept in a sorted list, so that the phrases starting with a prefix are found using binary search.
+"""
+from bisect import bisect_left, insort
+from threading import Lock
+from flask import current_app
+from imagenet_browser import db
+from imagenet_browser.models import Synset
+from imagenet_browser.utils import get_table_versions
+
+_lock = Lock()
+
+def split_words(words):
+    """
+    Split the comma-separated words of a synset into its word phrases.
+    """
+    return [phrase.strip() for phrase in words.split(",") if phrase.strip()]
+
+
+class WordIndex(object):
+    """
+    The word phrases of the synsets.
+    The keys are the case-folded phrases in sorted order, each mapping to the phrase as first seen and to the WordNet IDs of its synsets.
+    """
+
+    def __init__(self, synsets=()):
+        """
+        Build the index from an iterable of (WordNet ID, words) pairs.
+        The keys and WordNet IDs are appended as they come and sorted once at the end, rather than inserted in order one by one.
+        """
+        self.keys = []
+        self.entries = {}
+        self.lock = Lock()
+        for wnid, words in synsets:
+            for phrase in split_words(words):
+                key = phrase.casefold()
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = (phrase, [wnid])
+                    self.keys.append(key)
+                elif wnid not in entry[1]:
+                    entry[1].append(wnid)
+        self.keys.sort()
+        for _, wnids in self.entries.values():
+            if len(wnids) > 1:
+                wnids.sort()
+
+    @staticmethod
+    def from_database():
+        """
+        Build the index from the synset table.
+        """
+        return WordIndex(db.session.execute(db.select(Synset.wnid, Synset.words)))
+
+    def add(self, wnid, words):
+        """
+        Add the word phrases of the synset to the index.
+        Adding a synset that is already in the index has no effect.
+        """
+        with self.lock:
+            for phrase in split_words(words):
+                key = phrase.casefold()
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = (phrase, [wnid])
+                    insort(self.keys, key)
+                elif wnid not in entry[1]:
+                    insort(entry[1], wnid)
+
+    def remove(self, wnid, words):
+        """
+        Remove the word phrases of the synset from the index.
+        Removing a synset that is not in the index has no effect.
+        """
+        with self.lock:
+            for phrase in split_words(words):
+                key = phrase.casefold()
+                entry = self.entries.get(key)
+                if entry is None or wnid not in entry[1]:
+                    continue
+                entry[1].remove(wnid)
+                if not entry[1]:
+                    del self.entries[key]
+                    del self.keys[bisect_left(self.keys, key)]
+
+    def complete(self, prefix, limit):
+        """
+        Return at most limit (phrase, WordNet IDs) pairs for the phrases starting with the prefix, in alphabetical order.
+        The index is read under its lock, as the synset handlers may be patching it at the same time.
+        """
+        prefix = prefix.casefold()
+        completions = []
+        with self.lock:
+            i = bisect_left(self.keys, prefix)
+            for key in self.keys[i:i + limit]:
+                if not key.startswith(prefix):
+                    break
+                phrase, wnids = self.entries[key]
+                completions.append((phrase, list(wnids)))
+        return completions
+
+
+def get_word_index():
+    """
+    Return the word index of the current application, building it from the database if there is none
+    or if the version of the synset table is newer than that of the index, that is, if another process has changed the synsets.
+    The index is kept with the version of the synset table read before building it, usually the one already read for the entity tag.
+    An index that is newer than the version read by the request, having been patched since, is used as it is rather than rebuilt.
+    """
+    version, = get_table_versions(("synset",))
+    state = current_app.extensions.get("word_index")
+    if state is None or state[1] < version:
+        with _lock:
+            state = current_app.extensions.get("word_index")
+            if state is None or state[1] < version:
+                state = current_app.extensions["word_index"] = (WordIndex.from_database(), version)
+    return state[0]
+
+def update_word_index(version, removed=(), added=()):
+    """
+    Patch the word index of the current application after synsets have been added, edited, or deleted,
+    by removing the given (WordNet ID, words) pairs and adding the given (WordNet ID, words) pairs.
+    The version is that of the synset table after the change, which is only patched into an index of the version right before it,
+    and otherwise the index is left to be rebuilt from the database, as another process has changed the synsets in between.
+    Called by the synset handlers after committing.
+    """
+    with _lock:
+        state = current_app.extensions.get("word_index")
+        if state is None or state[1] != version - 1:
+            return
+        index = state[0]
+        for wnid, words in removed:
+            index.remove(wnid, words)
+        for wnid, words in added:
+            index.add(wnid, words)
+        current_app.extensions["word_index"] = (index, version)
@@ -0,0 +1,165 @@
+"""
+An optional in-process LRU cache of rendered GET responses, bounded by the number of bytes of the cached bodies.
+Responses are keyed by their path and query string and tagged with what they are built from, so that the write handlers can
+invalidate exactly the responses affected by a change: 'synset:<wnid>' for the resources of a synset, 'synsets' for the
+synset collection and the autocompletion, and 'images' for the image collection.
+A cached response is served without touching the database, and as such the cache is only consistent within a single process.
+"""
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import Response, current_app, request
+from imagenet_browser import db
+from imagenet_browser.constants import *
+from imagenet_browser.models import get_ancestor_wnids, synset_closure
+
+class ResponseCache(object):
+    """
+    The cached responses along with the tags they are indexed by and the number of hits and misses.
+    Each entry is a (body, ETag, tags) tuple, and the entries are kept in least recently used order.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.keys_by_tag = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        """
+        Return the (body, ETag) pair of the cached response and mark it as the most recently used, or None if there is no such response.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, body, etag, tags, generation):
+        """
+        Cache the response, evicting the least recently used responses until the cache fits within its size.
+        The response is not cached if any responses have been invalidated since the given generation was read,
+        as it might then have been built from data that has already changed.
+        """
+        size = len(key) + len(body)
+        with self.lock:
+            if generation != self.generation or size > self.max_bytes:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (body, etag, tags)
+            self.nbytes += size
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        """
+        Remove the cached responses having any of the tags.
+        """
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self.keys_by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def _remove(self, key):
+        body, _, tags = self.entries.pop(key)
+        self.nbytes -= len(key) + len(body)
+        for tag in tags:
+            keys = self.keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_tag[tag]
+
+    def stats(self):
+        """
+        Return a dictionary of the number of cached responses, their size in bytes, and the number of hits and misses along with the hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def get_response_cache():
+    """
+    Return the response cache of the current application, or None if it is disabled.
+    """
+    return current_app.extensions.get("response_cache")
+
+def cached_get(*tags):
+    """
+    Decorator for the GET handlers of resources whose responses can be cached.
+    The tags are formatted using the keyword arguments of the handler, for example 'synset:{wnid}'.
+    A cached response is returned, or 304 if its ETag matches the If-None-Match header, without calling the handler.
+    Otherwise, a successful response of the handler is cached.
+    The X-Cache header of the response tells whether it was a hit or a miss.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return method(*args, **kwargs)
+
+            key = request.full_path
+            cached = cache.get(key)
+            if cached is not None:
+                body, etag = cached
+                if request.if_none_match.contains(etag):
+                    response = Response(status=304)
+                else:
+                    response = Response(body, 200, mimetype=MASON)
+                response.set_etag(etag)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            generation = cache.generation
+            response = method(*args, **kwargs)
+            etag, _ = response.get_etag()
+            if response.status_code == 200 and etag is not None:
+                cache.put(key, response.get_data(), etag, frozenset(tag.format(**kwargs) for tag in tags), generation)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+def get_synset_tags(ancestors_of=(), descendants_of=()):
+    """
+    Return the tags of the given synsets along with those of their ancestors or descendants, respectively,
+    or nothing if the response cache is disabled so that the hierarchy is not queried needlessly.
+    To be called while the closure table still has the paths that the change affects.
+    """
+    if get_response_cache() is None:
+        return set()
+    wnids = set(ancestors_of) | set(descendants_of)
+    for wnid in ancestors_of:
+        wnids.update(get_ancestor_wnids(wnid))
+    for wnid in descendants_of:
+        wnids.update(db.session.execute(
+            db.select(synset_closure.c.descendant_wnid).where(synset_closure.c.ancestor_wnid == wnid)
+        ).scalars())
+    return set("synset:" + wnid for wnid in wnids)
+
+def invalidate_responses(*tags):
+    """
+    Remove the cached responses having any of the tags, if the response cache is enabled.
+    To be called by the write handlers after committing.
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        cache.invalidate(tags)
@@ -4,8 +4,35 @@ Constants used throughout the project.
 DB_LOAD_DIR = "./"
 SYNSET_PAGE_SIZE = 50
 IMAGE_PAGE_SIZE = 50
+AUTOCOMPLETE_LIMIT = 10
+IMAGE_BULK_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+SNAPSHOT_DIR = "./snapshot/"
+SNAPSHOT_BATCH_SIZE = 65536
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
 MASON = "application/vnd.mason+json"
+NDJSON = "application/x-ndjson"
+PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
 LINK_RELATIONS_URL = "/imagenet_browser/link-relations/"
+METRICS_URL = "/metrics"
+PROFILE_HEADER = "X-Profile"
 ERROR_PROFILE = "/profiles/error/"
 SYNSET_PROFILE = "/profiles/synset/"
 IMAGE_PROFILE = "/profiles/image/"
+DB_LOAD_BATCH_SIZE = 10000
+SQLITE_PROFILES = {
+    "default": {},
+    "concurrent": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 268435456,
+        "cache_size": -65536
+    }
+}
+DB_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "journal_mode": "MEMORY",
+    "cache_size": -262144,
+    "temp_store": "MEMORY"
+}
@@ -0,0 +1,167 @@
+"""
+A compact, read-only, in-memory snapshot of the is-a hierarchy for answering tree queries without the database.
+WordNet IDs are encoded as integers and the parents of each synset are stored as CSR-style arrays,
+so that the whole WordNet hierarchy takes a few megabytes.
+"""
+from array import array
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from flask import current_app
+from imagenet_browser import db
+from imagenet_browser.models import Synset, hyponyms
+from imagenet_browser.utils import get_table_versions
+
+_lock = Lock()
+
+"""
+The tables the snapshot is built from, the versions of which the snapshot is kept with.
+"""
+SNAPSHOT_TABLES = ("synset", "hyponyms")
+
+def encode_wnid(wnid):
+    """
+    Encode a WordNet ID, the letter n followed by 8 ASCII digits as in the synset schema, as an integer.
+    Raise ValueError if the WordNet ID is malformed, including when it has digits of other scripts, which int would accept.
+    """
+    if len(wnid) != 9 or wnid[0] != "n" or not (wnid[1:].isascii() and wnid[1:].isdigit()):
+        raise ValueError("Malformed WordNet ID '{}'".format(wnid))
+    return int(wnid[1:])
+
+def decode_wnid(number):
+    """
+    Decode an integer encoded by encode_wnid back to a WordNet ID.
+    """
+    return "n{:08d}".format(number)
+
+
+class HierarchySnapshot(object):
+    """
+    The is-a hierarchy as arrays.
+    Synsets are identified by their index in the sorted array of encoded WordNet IDs.
+    The parents of the synset at index i are parent_indices[parent_offsets[i]:parent_offsets[i + 1]].
+    """
+
+    def __init__(self, wnids, edges):
+        """
+        Build the snapshot from an iterable of WordNet IDs and an iterable of (synset, hyponym) WordNet ID pairs.
+        """
+        self.ids = array("i", sorted(encode_wnid(wnid) for wnid in wnids))
+        parents = [[] for _ in self.ids]
+        for wnid, hyponym_wnid in edges:
+            parents[self.index(hyponym_wnid)].append(self.index(wnid))
+
+        self.parent_offsets = array("i", [0])
+        self.parent_indices = array("i")
+        for synset_parents in parents:
+            self.parent_indices.extend(sorted(synset_parents))
+            self.parent_offsets.append(len(self.parent_indices))
+
+    @staticmethod
+    def from_database():
+        """
+        Build the snapshot from the synset and hyponyms tables.
+        """
+        wnids = db.session.execute(db.select(Synset.wnid)).scalars()
+        edges = db.session.execute(db.select(hyponyms.c.synset_wnid, hyponyms.c.synset_hyponym_wnid))
+        return HierarchySnapshot(wnids, edges)
+
+    def __contains__(self, wnid):
+        try:
+            self.index(wnid)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def nbytes(self):
+        """
+        Return the number of bytes used by the arrays of the snapshot.
+        """
+        return sum(a.itemsize * len(a) for a in (self.ids, self.parent_offsets, self.parent_indices))
+
+    def index(self, wnid):
+        """
+        Return the index of the synset.
+        Raise KeyError if there is no such synset.
+        """
+        number = encode_wnid(wnid)
+        i = bisect_left(self.ids, number)
+        if i == len(self.ids) or self.ids[i] != number:
+            raise KeyError(wnid)
+        return i
+
+    def parents(self, i):
+        """
+        Return the indices of the parents of the synset at the index.
+        """
+        return self.parent_indices[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+
+    def _ancestor_distances(self, i):
+        """
+        Return a dictionary mapping the indices of the synset and its ancestors to their distances from the synset,
+        along with a dictionary mapping each of those indices to the index of the next synset towards the synset.
+        """
+        distances = {i: 0}
+        previous = {i: None}
+        queue = deque([i])
+        while queue:
+            j = queue.popleft()
+            for k in self.parents(j):
+                if k not in distances:
+                    distances[k] = distances[j] + 1
+                    previous[k] = j
+                    queue.append(k)
+        return distances, previous
+
+    def path_to_root(self, wnid):
+        """
+        Return the WordNet IDs on the shortest path from the synset up to a synset that has no parents, both included.
+        Raise KeyError if there is no such synset.
+        """
+        i = self.index(wnid)
+        distances, previous = self._ancestor_distances(i)
+        roots = (j for j in distances if self.parent_offsets[j] == self.parent_offsets[j + 1])
+        root = min(roots, key=lambda j: (distances[j], j), default=i)
+        path = []
+        while root is not None:
+            path.append(decode_wnid(self.ids[root]))
+            root = previous[root]
+        path.reverse()
+        return path
+
+    def depth(self, wnid):
+        """
+        Return the length of the shortest path from the synset up to a synset that has no parents.
+        Raise KeyError if there is no such synset.
+        """
+        return len(self.path_to_root(wnid)) - 1
+
+    def lowest_common_ancestor(self, wnid, other_wnid):
+        """
+        Return the WordNet ID of the common ancestor of the synsets, either of which may also be the common ancestor itself,
+        that has the shortest combined distance to them, or None if the synsets have no common ancestor.
+        Raise KeyError if there is no such synset.
+        """
+        distances, _ = self._ancestor_distances(self.index(wnid))
+        other_distances, _ = self._ancestor_distances(self.index(other_wnid))
+        common = [j for j in distances if j in other_distances]
+        if not common:
+            return None
+        return decode_wnid(self.ids[min(common, key=lambda j: (distances[j] + other_distances[j], j))])
+
+
+def get_hierarchy_snapshot():
+    """
+    Return the hierarchy snapshot of the current application, building it from the database if there is none
+    or if the synset or hyponyms table has changed since it was built, whether by this process or another one.
+    The snapshot is kept with the versions of the tables read before building it, usually the ones already read for the entity tag,
+    so that a change made during the build can at worst cause the snapshot to be built again, but never a stale snapshot to be kept.
+    """
+    versions = get_table_versions(SNAPSHOT_TABLES)
+    state = current_app.extensions.get("hierarchy_snapshot")
+    if state is None or state[1] != versions:
+        with _lock:
+            state = current_app.extensions.get("hierarchy_snapshot")
+            if state is None or state[1] != versions:
+                state = current_app.extensions["hierarchy_snapshot"] = (HierarchySnapshot.from_database(), versions)
+    return state[0]
@@ -0,0 +1,65 @@
+"""
+Per-request instrumentation of the SQL queries issued by the handlers, hooked into the cursor execution events of the engine.
+The number of queries and the time spent executing them are recorded for each request and exposed in the Server-Timing header
+of the response along with the total time of the request, so that they show up in the developer tools of browsers.
+A warning is logged when a request issues more queries than the query budget of its endpoint, which catches N+1 query patterns
+introduced by changes to the handlers as soon as the tests exercising them are run.
+"""
+from time import perf_counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from imagenet_browser import db
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        context._query_start_time = perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        elapsed = perf_counter() - context._query_start_time
+        g.query_count = g.get("query_count", 0) + 1
+        g.query_time = g.get("query_time", 0.0) + elapsed
+
+def get_query_stats():
+    """
+    Return the number of queries issued so far during the current request and the time spent executing them in seconds.
+    """
+    return g.get("query_count", 0), g.get("query_time", 0.0)
+
+def get_query_budget(app, endpoint):
+    """
+    Return the query budget of the endpoint, which is either given by the QUERY_BUDGETS configuration value or the QUERY_BUDGET default.
+    None means that the endpoint has no budget.
+    """
+    return app.config["QUERY_BUDGETS"].get(endpoint, app.config["QUERY_BUDGET"])
+
+def init_app(app):
+    """
+    Instrument the engine of the application and register the request hooks that report the queries of each request.
+    The start time of a query is kept on its execution context, which is discarded along with the query even if the query fails.
+    The queries of streamed response bodies are issued after the headers have been sent, and as such are not reported.
+    """
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start_time = perf_counter()
+        g.query_count = 0
+        g.query_time = 0.0
+
+    @app.after_request
+    def report_queries(response):
+        count, elapsed = get_query_stats()
+        total = perf_counter() - g.get("request_start_time", perf_counter())
+        response.headers["Server-Timing"] = 'db;dur={:.2f};desc="{} queries", total;dur={:.2f}'.format(
+            elapsed * 1000, count, total * 1000
+        )
+
+        budget = get_query_budget(app, request.endpoint)
+        if budget is not None and count > budget:
+            app.logger.warning("%s %s issued %d queries, over the budget of %d of endpoint '%s'",
+                request.method, request.full_path, count, budget, request.endpoint
+            )
+        return response
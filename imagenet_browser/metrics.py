@@ -0,0 +1,145 @@
+"""
+In-process request metrics exported in the Prometheus text format at METRICS_URL.
+The requests are counted per resource, method, and status code, and their latencies are recorded in per-resource histograms
+along with the time spent in the database and the number of response bytes.
+The statistics of the response cache are exported as well when it is enabled.
+Each worker process keeps its own metrics, which Prometheus adds up when scraping the workers separately.
+"""
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+from flask import Response, current_app, g, request
+from imagenet_browser.constants import *
+
+class Metrics(object):
+    """
+    The counters and latency histograms of the requests handled by the application.
+    A histogram is kept as the number of requests per bucket, the last bucket being for latencies above the largest bound,
+    and is only made cumulative when exported.
+    """
+
+    def __init__(self, buckets=METRICS_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.requests = {}
+        self.histograms = {}
+        self.latency_sums = {}
+        self.db_times = {}
+        self.db_queries = {}
+        self.response_bytes = {}
+        self.lock = Lock()
+
+    def observe(self, resource, method, status, latency, db_time, db_queries, nbytes):
+        """
+        Record a request to the resource.
+        """
+        bucket = bisect_left(self.buckets, latency)
+        with self.lock:
+            key = (resource, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.histograms.get(resource)
+            if histogram is None:
+                histogram = self.histograms[resource] = [0] * (len(self.buckets) + 1)
+            histogram[bucket] += 1
+            self.latency_sums[resource] = self.latency_sums.get(resource, 0.0) + latency
+            self.db_times[resource] = self.db_times.get(resource, 0.0) + db_time
+            self.db_queries[resource] = self.db_queries.get(resource, 0) + db_queries
+            self.response_bytes[resource] = self.response_bytes.get(resource, 0) + nbytes
+
+    def render(self, cache_stats=None):
+        """
+        Return the metrics, along with the given statistics of the response cache, in the Prometheus text format.
+        """
+        lines = []
+        with self.lock:
+            _add_metric(lines, "requests_total", "counter", "Number of requests handled.", [
+                ({"resource": resource, "method": method, "status": status}, count)
+                for (resource, method, status), count in sorted(self.requests.items())
+            ])
+
+            lines.append("# HELP imagenet_browser_request_duration_seconds Latency of requests from routing to the response.")
+            lines.append("# TYPE imagenet_browser_request_duration_seconds histogram")
+            for resource, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram):
+                    cumulative += count
+                    labels = _format_labels({"resource": resource, "le": "+Inf" if bound == float("inf") else repr(bound)})
+                    lines.append("imagenet_browser_request_duration_seconds_bucket{} {}".format(labels, cumulative))
+                labels = _format_labels({"resource": resource})
+                lines.append("imagenet_browser_request_duration_seconds_sum{} {!r}".format(labels, self.latency_sums[resource]))
+                lines.append("imagenet_browser_request_duration_seconds_count{} {}".format(labels, cumulative))
+
+            for name, metric_type, description, values in [
+                ("db_duration_seconds_total", "counter", "Time spent executing SQL queries.", self.db_times),
+                ("db_queries_total", "counter", "Number of SQL queries issued.", self.db_queries),
+                ("response_bytes_total", "counter", "Number of response body bytes, excluding streamed responses.", self.response_bytes)
+            ]:
+                _add_metric(lines, name, metric_type, description, [
+                    ({"resource": resource}, value) for resource, value in sorted(values.items())
+                ])
+
+        if cache_stats is not None:
+            _add_metric(lines, "response_cache_entries", "gauge", "Number of cached responses.", [({}, cache_stats["entries"])])
+            _add_metric(lines, "response_cache_bytes", "gauge", "Size of the cached responses in bytes.", [({}, cache_stats["bytes"])])
+            _add_metric(lines, "response_cache_hits_total", "counter", "Number of response cache hits.", [({}, cache_stats["hits"])])
+            _add_metric(lines, "response_cache_misses_total", "counter", "Number of response cache misses.", [({}, cache_stats["misses"])])
+
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels.items()) + "}"
+
+def _add_metric(lines, name, metric_type, description, samples):
+    lines.append("# HELP imagenet_browser_{} {}".format(name, description))
+    lines.append("# TYPE imagenet_browser_{} {}".format(name, metric_type))
+    for labels, value in samples:
+        lines.append("imagenet_browser_{}{} {!r}".format(name, _format_labels(labels), value))
+
+def get_resource_name(endpoint):
+    """
+    Return the name of the flask-restful resource class handling the endpoint, or the endpoint itself for plain views.
+    Requests that did not match any route are attributed to 'unmatched' so that scanning for URLs cannot grow the metrics without bound.
+    """
+    if endpoint is None:
+        return "unmatched"
+    view = current_app.view_functions[endpoint]
+    return getattr(getattr(view, "view_class", None), "__name__", endpoint)
+
+def init_app(app):
+    """
+    Create the metrics of the application, register the request hooks that record every request, and register the metrics view.
+    The database time and number of queries are recorded only if the query instrumentation is enabled.
+    """
+    metrics = app.extensions["metrics"] = Metrics()
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_start_time = perf_counter()
+
+    @app.after_request
+    def record_metrics(response):
+        latency = perf_counter() - g.get("metrics_start_time", perf_counter())
+        metrics.observe(
+            get_resource_name(request.endpoint),
+            request.method,
+            response.status_code,
+            latency,
+            g.get("query_time", 0.0),
+            g.get("query_count", 0),
+            0 if response.is_streamed else response.calculate_content_length() or 0
+        )
+        return response
+
+    @app.route(METRICS_URL)
+    def send_metrics():
+        """
+        The route's view function listening for GET.
+        Return the metrics of the process in the Prometheus text format.
+        """
+        cache = app.extensions.get("response_cache")
+        response = Response(metrics.render(cache.stats() if cache is not None else None), 200, content_type=PROMETHEUS)
+        response.headers["Cache-Control"] = "no-store"
+        return response
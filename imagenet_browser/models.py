@@ -1,7 +1,13 @@
-from datetime import datetime
+import os
+from datetime import date
+from functools import lru_cache
+from itertools import islice
 from random import randint
+from time import perf_counter
 import click
 from flask.cli import with_appcontext
+from jsonschema.validators import validator_for
+from sqlalchemy import DDL, bindparam, event, func, select, text
 from imagenet_browser import db
 from imagenet_browser.constants import *
 
@@ -10,22 +16,51 @@ The mapping table for the many-to-many relationship in the Synset model.
 A synset can have multiple hyponyms and can itself be a hyponym to any synset.
 A synset and its hyponym can be thought to have a "is-a" relationship.
 The database engine side CASCADEs are not really necessary here.
+The primary key serves lookups of the hyponyms of a synset while the index on the hyponym serves lookups of its parents.
 """
 hyponyms = db.Table(
     "hyponyms",
     db.Column("synset_wnid", db.String(9), db.ForeignKey("synset.wnid", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True),
-    db.Column("synset_hyponym_wnid", db.String(9), db.ForeignKey("synset.wnid", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    db.Column("synset_hyponym_wnid", db.String(9), db.ForeignKey("synset.wnid", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_hyponyms_synset_hyponym_wnid", "synset_hyponym_wnid")
 )
 
+"""
+The closure table of the is-a hierarchy formed by the hyponyms mapping table.
+Each row relates a synset to one of its descendants, that is, a hyponym, a hyponym of a hyponym, and so on.
+The depth is the length of the shortest path from the ancestor to the descendant, a hyponym having a depth of one.
+The primary key serves lookups of the descendants of a synset while the index on the descendant serves lookups of its ancestors.
+The table is built by 'flask load-db' and kept up to date by the functions defined further below.
+"""
+synset_closure = db.Table(
+    "synset_closure",
+    db.Column("ancestor_wnid", db.String(9), db.ForeignKey("synset.wnid", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True),
+    db.Column("descendant_wnid", db.String(9), db.ForeignKey("synset.wnid", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True),
+    db.Column("depth", db.Integer, nullable=False),
+    db.Index("ix_synset_closure_descendant_wnid", "descendant_wnid", "ancestor_wnid")
+)
+
+def compile_validator(schema):
+    """
+    Check the schema and return a validator for it of the class that jsonschema.validate would use.
+    Doing this once per schema rather than in every call to jsonschema.validate avoids rechecking the schema and rebuilding the validator.
+    """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
 class Synset(db.Model):
     """
     The databse model, subclassing db.Model, representing a synset.
     It has a many-to-many relationship with itself, and a one-to-many relationship with the Image model.
     The WordNet hierarchy groups meaningful concepts into synsets, each described by multiple words or word phrases.
+    The number of images of the synset, and of the synset along with its descendants, are precomputed by the functions defined further below.
     """
     wnid = db.Column(db.String(9), primary_key=True)
     words = db.Column(db.String(256), nullable=False)
     gloss = db.Column(db.String(512), nullable=False)
+    image_count = db.Column(db.Integer, nullable=False, default=0)
+    subtree_image_count = db.Column(db.Integer, nullable=False, default=0)
 
     images = db.relationship("Image", backref="synset", passive_deletes=True)
     hyponyms = db.relationship(
@@ -37,10 +72,12 @@ class Synset(db.Model):
     )
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_schema(wnid_only=False):
         """
         The schema for the Synset model used in hypermedia responses and verifying client requests.
         The subschema is only used for the imagenet_browser:add_hyponym control.
+        The schema is built once and then shared, and as such must not be modified.
         """
         schema = {
             "type": "object",
@@ -64,6 +101,15 @@ class Synset(db.Model):
             }
         return schema
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_validator(wnid_only=False):
+        """
+        The validator for the schema of the Synset model used in verifying client requests.
+        The validator is compiled once and then shared.
+        """
+        return compile_validator(Synset.get_schema(wnid_only=wnid_only))
+
 
 class Image(db.Model):
     """
@@ -79,15 +125,25 @@ class Image(db.Model):
     date = db.Column(db.String(10), nullable=True)
 
     @staticmethod
-    def get_schema():
+    @lru_cache(maxsize=None)
+    def get_schema(with_wnid=False):
         """
         The schema for the Image model used in hypermedia responses and verifying client requests.
+        The superschema that also requires the WordNet ID of the synset is only used for bulk imports to the image collection.
+        The schema is built once and then shared, and as such must not be modified.
         """
         schema = {
             "type": "object",
             "required": ["imid", "url"]
         }
         props = schema["properties"] = {}
+        if with_wnid:
+            schema["required"].insert(0, "synset_wnid")
+            props["synset_wnid"] = {
+                "description": "The WordNet ID of the synset of the image",
+                "type": "string",
+                "pattern": "^n[0-9]{8}$"
+            }
         props["imid"] = {
             "description": "The numerical ID of the image",
             "type": "integer",
@@ -104,6 +160,279 @@ class Image(db.Model):
         }
         return schema
 
+    @staticmethod
+    def normalize_date(value):
+        """
+        Return the date, as allowed by the schema, zero-padded as YYYY-MM-DD.
+        The dates are stored in this form so that comparing them as strings orders them as dates.
+        Raise ValueError if the date does not exist, such as 2011-02-30.
+        """
+        year, month, day = value.split("-")
+        return date(int(year), int(month), int(day)).isoformat()
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_validator(with_wnid=False):
+        """
+        The validator for the schema of the Image model used in verifying client requests.
+        The validator is compiled once and then shared.
+        """
+        return compile_validator(Image.get_schema(with_wnid=with_wnid))
+
+
+class Counter(db.Model):
+    """
+    The database model, subclassing db.Model, representing a counter.
+    The number of rows in the synset and image tables are kept in counters named after the tables,
+    so that exact totals are available without counting the rows on every request.
+    The counters are updated explicitly by the handlers that add or delete rows, alongside bumping the version counters,
+    and recomputed by 'flask load-db', so that bulk loads do not pay for them on every row.
+    """
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+
+    @staticmethod
+    def get_value(name):
+        """
+        Return the value of the named counter or None if there is no such counter.
+        """
+        counter = Counter.query.filter_by(name=name).first()
+        return counter.value if counter else None
+
+"""
+Create the row counters, starting from zero, once all tables exist.
+"""
+COUNTED_TABLES = ("synset", "image")
+for _table in COUNTED_TABLES:
+    event.listen(db.metadata, "after_create", DDL(
+        "INSERT OR IGNORE INTO counter (name, value) VALUES ('{}', 0)".format(_table)
+    ))
+
+"""
+The version counters of the tables, named after the tables with a '_version' suffix.
+A version counter is bumped by every handler, or command, that changes its table, and the versions of the tables
+that a representation is built from are used as its entity tag for conditional GETs.
+The counters are bumped explicitly rather than by triggers so that bulk loads do not pay for them on every row,
+and as such changes propagated by CASCADEs are accounted for by bumping the versions of the referencing tables as well.
+The same goes for the row counters, which are updated where the versions are bumped.
+"""
+VERSIONED_TABLES = ("synset", "image", "hyponyms")
+for _table in VERSIONED_TABLES:
+    event.listen(db.metadata, "after_create", DDL(
+        "INSERT OR IGNORE INTO counter (name, value) VALUES ('{}_version', 0)".format(_table)
+    ))
+
+"""
+The full-text search index over the words and gloss of the synsets, an SQLite FTS5 virtual table.
+Its rowid is the numerical part of the WordNet ID so that a single synset can be unindexed without a full scan.
+The index is filled by 'flask load-db' and kept in sync by the synset handlers using the functions defined further below.
+"""
+event.listen(db.metadata, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS synset_fts USING fts5(wnid UNINDEXED, words, gloss)"
+))
+
+
+def bump_versions(connection, tables):
+    """
+    Increment the version counters of the tables in the current transaction.
+    The connection can be either a database connection or a session.
+    """
+    connection.execute(
+        Counter.__table__.update().where(
+            Counter.name.in_([table + "_version" for table in tables])
+        ).values(value=Counter.value + 1)
+    )
+
+def update_row_counts(connection, deltas):
+    """
+    Add the deltas, keyed by the names of the tables, to the row counters of the tables in the current transaction.
+    Rows deleted through CASCADEs must be included by the caller.
+    The connection can be either a database connection or a session.
+    """
+    for table, delta in deltas.items():
+        if delta:
+            connection.execute(
+                Counter.__table__.update().where(Counter.name == table).values(value=Counter.value + delta)
+            )
+
+def rebuild_row_counts(connection):
+    """
+    Recompute the row counters of the synset and image tables by counting their rows.
+    The connection can be either a database connection or a session.
+    """
+    for table in COUNTED_TABLES:
+        connection.execute(text(
+            "UPDATE counter SET value = (SELECT COUNT(*) FROM {0}) WHERE name = '{0}'".format(table)
+        ))
+
+def get_versions(tables, connection=None):
+    """
+    Return the values of the version counters of the tables in the same order as the tables, using a single query.
+    The connection can be either a database connection or a session, the session of the application being the default.
+    """
+    names = [table + "_version" for table in tables]
+    versions = dict((connection or db.session).execute(select(Counter.name, Counter.value).where(Counter.name.in_(names))).all())
+    return [versions.get(name, 0) for name in names]
+
+def rebuild_synset_closure(connection):
+    """
+    Rebuild the synset_closure table from the hyponyms table using a recursive query.
+    The connection can be either a database connection or a session.
+    Return the number of rows in the rebuilt table.
+    """
+    connection.execute(synset_closure.delete())
+    connection.execute(text(
+        "INSERT INTO synset_closure (ancestor_wnid, descendant_wnid, depth) "
+        "WITH RECURSIVE closure(ancestor_wnid, descendant_wnid, depth) AS ("
+        "SELECT synset_wnid, synset_hyponym_wnid, 1 FROM hyponyms "
+        "UNION "
+        "SELECT closure.ancestor_wnid, hyponyms.synset_hyponym_wnid, closure.depth + 1 "
+        "FROM closure JOIN hyponyms ON hyponyms.synset_wnid = closure.descendant_wnid"
+        ") "
+        "SELECT ancestor_wnid, descendant_wnid, MIN(depth) FROM closure GROUP BY ancestor_wnid, descendant_wnid"
+    ))
+    return connection.execute(select(func.count()).select_from(synset_closure)).scalar()
+
+def add_synset_closure(wnid, hyponym_wnid):
+    """
+    Update the synset_closure table after the hyponym has been added to the synset.
+    Every ancestor of the synset, including the synset itself, becomes an ancestor of every descendant of the hyponym,
+    including the hyponym itself, unless it already was one through a shorter path.
+    """
+    db.session.execute(text(
+        "INSERT INTO synset_closure (ancestor_wnid, descendant_wnid, depth) "
+        "SELECT ancestors.wnid, descendants.wnid, ancestors.depth + 1 + descendants.depth FROM "
+        "(SELECT :wnid AS wnid, 0 AS depth UNION ALL "
+        "SELECT ancestor_wnid, depth FROM synset_closure WHERE descendant_wnid = :wnid) AS ancestors, "
+        "(SELECT :hyponym_wnid AS wnid, 0 AS depth UNION ALL "
+        "SELECT descendant_wnid, depth FROM synset_closure WHERE ancestor_wnid = :hyponym_wnid) AS descendants "
+        "WHERE true "
+        "ON CONFLICT (ancestor_wnid, descendant_wnid) DO UPDATE SET depth = MIN(depth, excluded.depth)"
+    ), {"wnid": wnid, "hyponym_wnid": hyponym_wnid})
+
+def remove_synset_closure(wnid, *hyponym_wnids):
+    """
+    Update the synset_closure table after the hyponyms have been removed from the synset.
+    Only the ancestors of the hyponyms and of their descendants that lie outside of the hyponyms' subtrees can be affected,
+    so those rows are deleted and then derived again, in a single statement, from the edges entering the subtrees from outside
+    along with the unaffected ancestors of their parents, following the edges within the subtrees with a recursive query.
+    As such, removing any number of hyponyms takes two statements regardless of the size of the subtrees.
+    """
+    subtree = select(synset_closure.c.descendant_wnid).where(synset_closure.c.ancestor_wnid.in_(hyponym_wnids)).union(
+        select(Synset.wnid).where(Synset.wnid.in_(hyponym_wnids))
+    )
+    db.session.execute(synset_closure.delete().where(
+        synset_closure.c.descendant_wnid.in_(subtree),
+        synset_closure.c.ancestor_wnid.not_in(subtree)
+    ))
+
+    db.session.execute(text(
+        "WITH subtree (wnid) AS ("
+        "SELECT wnid FROM synset WHERE wnid IN :hyponym_wnids UNION "
+        "SELECT descendant_wnid FROM synset_closure WHERE ancestor_wnid IN :hyponym_wnids"
+        "), entering (synset_wnid, synset_hyponym_wnid) AS ("
+        "SELECT synset_wnid, synset_hyponym_wnid FROM hyponyms "
+        "WHERE synset_hyponym_wnid IN subtree AND synset_wnid NOT IN subtree"
+        "), paths (ancestor_wnid, descendant_wnid, depth) AS ("
+        "SELECT synset_wnid, synset_hyponym_wnid, 1 FROM entering "
+        "UNION "
+        "SELECT synset_closure.ancestor_wnid, entering.synset_hyponym_wnid, synset_closure.depth + 1 FROM entering "
+        "JOIN synset_closure ON synset_closure.descendant_wnid = entering.synset_wnid "
+        "UNION "
+        "SELECT paths.ancestor_wnid, hyponyms.synset_hyponym_wnid, paths.depth + 1 FROM paths "
+        "JOIN hyponyms ON hyponyms.synset_wnid = paths.descendant_wnid"
+        ") "
+        "INSERT INTO synset_closure (ancestor_wnid, descendant_wnid, depth) "
+        "SELECT ancestor_wnid, descendant_wnid, MIN(depth) FROM paths GROUP BY ancestor_wnid, descendant_wnid"
+    ).bindparams(bindparam("hyponym_wnids", expanding=True)), {"hyponym_wnids": list(hyponym_wnids)})
+
+
+def rebuild_image_counts(connection):
+    """
+    Recompute the image_count and subtree_image_count columns of every synset from the image and synset_closure tables.
+    The connection can be either a database connection or a session.
+    """
+    connection.execute(text(
+        "UPDATE synset SET image_count = (SELECT COUNT(*) FROM image WHERE image.synset_wnid = synset.wnid)"
+    ))
+    refresh_subtree_image_counts(connection)
+
+def refresh_subtree_image_counts(connection, wnids=None):
+    """
+    Recompute the subtree_image_count column of the given synsets, or every synset if None, as the sum of the
+    image_count columns of the synset and its descendants.
+    This is used when the descendants of the synsets change, while adding and deleting images uses update_image_counts.
+    """
+    statement = (
+        "UPDATE synset SET subtree_image_count = image_count + COALESCE(("
+        "SELECT SUM(descendant.image_count) FROM synset_closure "
+        "JOIN synset AS descendant ON descendant.wnid = synset_closure.descendant_wnid "
+        "WHERE synset_closure.ancestor_wnid = synset.wnid"
+        "), 0)"
+    )
+    if wnids is None:
+        connection.execute(text(statement))
+    elif wnids:
+        connection.execute(text(statement + " WHERE wnid = :wnid"), [{"wnid": wnid} for wnid in wnids])
+
+def update_image_counts(wnid, delta):
+    """
+    Add the delta to the image_count column of the synset and to the subtree_image_count columns of the synset and its ancestors.
+    """
+    db.session.execute(text(
+        "UPDATE synset SET image_count = image_count + CASE WHEN wnid = :wnid THEN :delta ELSE 0 END, "
+        "subtree_image_count = subtree_image_count + :delta "
+        "WHERE wnid = :wnid OR wnid IN (SELECT ancestor_wnid FROM synset_closure WHERE descendant_wnid = :wnid)"
+    ), {"wnid": wnid, "delta": delta})
+
+def get_ancestor_wnids(wnid):
+    """
+    Return the WordNet IDs of the ancestors of the synset along with the synset's own WordNet ID.
+    """
+    wnids = db.session.execute(
+        select(synset_closure.c.ancestor_wnid).where(synset_closure.c.descendant_wnid == wnid)
+    ).scalars().all()
+    wnids.append(wnid)
+    return wnids
+
+
+def rebuild_synset_search(connection):
+    """
+    Rebuild the full-text search index from the synset table.
+    The connection can be either a database connection or a session.
+    """
+    connection.execute(text("DELETE FROM synset_fts"))
+    connection.execute(text(
+        "INSERT INTO synset_fts (rowid, wnid, words, gloss) "
+        "SELECT CAST(substr(wnid, 2) AS INTEGER), wnid, words, gloss FROM synset"
+    ))
+
+def index_synset(synset):
+    """
+    Add the synset to the full-text search index.
+    """
+    db.session.execute(text(
+        "INSERT INTO synset_fts (rowid, wnid, words, gloss) VALUES (CAST(substr(:wnid, 2) AS INTEGER), :wnid, :words, :gloss)"
+    ), {"wnid": synset.wnid, "words": synset.words, "gloss": synset.gloss})
+
+def unindex_synset(wnid):
+    """
+    Remove the synset from the full-text search index.
+    """
+    db.session.execute(text("DELETE FROM synset_fts WHERE rowid = CAST(substr(:wnid, 2) AS INTEGER)"), {"wnid": wnid})
+
+def search_synsets(query, offset, limit):
+    """
+    Return the synsets whose words or gloss contain every term of the query, ranked by relevance with matches in the words
+    weighing more than matches in the gloss.
+    Each term is quoted, so the query is never interpreted using the FTS5 query syntax.
+    """
+    terms = " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+    return Synset.query.from_statement(text(
+        "SELECT synset.* FROM synset_fts JOIN synset ON synset.wnid = synset_fts.wnid "
+        "WHERE synset_fts MATCH :terms ORDER BY bm25(synset_fts, 0.0, 4.0, 1.0), synset.wnid LIMIT :limit OFFSET :offset"
+    )).params(terms=terms, limit=limit, offset=offset).all()
+
 
 @click.command("init-db")
 @with_appcontext
@@ -115,8 +444,10 @@ def init_db_command(): # pragma: no cover
     db.create_all()
 
 @click.command("load-db")
+@click.option("--directory", default=DB_LOAD_DIR, show_default=True, help="Directory containing the ImageNet files.")
+@click.option("--batch-size", default=DB_LOAD_BATCH_SIZE, show_default=True, help="Number of rows per executemany call.")
 @with_appcontext
-def load_db_command(): # pragma: no cover
+def load_db_command(directory, batch_size):
     """
     Populate the initial database using the ImageNet files in the DB_LOAD_DIR directory.
     The following ImageNet files are utilized for populating the initial database:
@@ -124,57 +455,121 @@ def load_db_command(): # pragma: no cover
     http://www.image-net.org/archive/gloss.txt
     http://www.image-net.org/archive/wordnet.is_a.txt
     http://web.archive.org/web/20190130005544/http://image-net.org/imagenet_data/urls/imagenet_fall11_urls.tgz
+    The files are streamed and their rows are inserted in batches of the given size using Core inserts.
+    Each file is loaded in a single transaction on a connection tuned with DB_LOAD_PRAGMAS.
+    A database in WAL mode is kept in it, so that the API can keep serving reads while the files are being loaded.
+    Finally, the closure table of the is-a hierarchy is built from the loaded hyponyms, the image counts of the synsets and the row counters are computed,
+    and the full-text search index is built, after which the versions of all tables are bumped.
     """
+    directory = os.path.join(directory, "")
+
+    with db.engine.connect() as connection:
+        pragmas_old = {}
+        for pragma, value in DB_LOAD_PRAGMAS.items():
+            value_old = connection.exec_driver_sql("PRAGMA {}".format(pragma)).scalar()
+            if pragma == "journal_mode" and value_old == "wal":
+                continue
+            pragmas_old[pragma] = value_old
+            connection.exec_driver_sql("PRAGMA {}={}".format(pragma, value))
+
+        try:
+            wnids = set()
+            _load_table(connection, Synset.__table__, _read_synsets(directory, wnids), batch_size)
+            _load_table(connection, Image.__table__, _read_images(directory), batch_size)
+            skipped = []
+            _load_table(connection, hyponyms, _read_hyponyms(directory, wnids, skipped), batch_size)
+            if skipped:
+                click.echo("Skipped {} invalid or duplicate hyponym lines, first being '{}'".format(len(skipped), skipped[0]))
+
+            time_start = perf_counter()
+            count = rebuild_synset_closure(connection)
+            connection.commit()
+            click.echo("Built {} rows into '{}' in {:.1f} s".format(count, synset_closure.name, perf_counter() - time_start))
 
-    with open(DB_LOAD_DIR + "words.txt", "r") as words_file, open(DB_LOAD_DIR + "gloss.txt", "r") as gloss_file:
+            time_start = perf_counter()
+            rebuild_image_counts(connection)
+            rebuild_row_counts(connection)
+            connection.commit()
+            click.echo("Computed image counts in {:.1f} s".format(perf_counter() - time_start))
+
+            time_start = perf_counter()
+            rebuild_synset_search(connection)
+            bump_versions(connection, VERSIONED_TABLES)
+            connection.commit()
+            click.echo("Built the full-text search index in {:.1f} s".format(perf_counter() - time_start))
+        finally:
+            connection.rollback()
+            for pragma, value in pragmas_old.items():
+                connection.exec_driver_sql("PRAGMA {}={}".format(pragma, value))
+
+def _read_synsets(directory, wnids):
+    """
+    Yield synset rows from the words.txt and gloss.txt files.
+    The WordNet IDs of the synsets are added to the passed set.
+    """
+    with open(directory + "words.txt", "r") as words_file, open(directory + "gloss.txt", "r") as gloss_file:
         for words_line, gloss_line in zip(words_file, gloss_file):
-            wnid_first, words = words_line.split(sep="\t", maxsplit=1)
-            wnid_second, gloss = gloss_line.split(sep="\t", maxsplit=1)
+            wnid_first, words = words_line.rstrip("\n").split(sep="\t", maxsplit=1)
+            wnid_second, gloss = gloss_line.rstrip("\n").split(sep="\t", maxsplit=1)
 
             assert wnid_first == wnid_second
-            wnid = wnid_first
-            words = words[:-1]
-            gloss = gloss[:-1]
-
-            synset = Synset(
-                wnid=wnid,
-                words=words,
-                gloss=gloss
-            )
-            db.session.add(synset)
-        db.session.commit()
+            wnids.add(wnid_first)
+            yield {"wnid": wnid_first, "words": words, "gloss": gloss}
 
-    with open(DB_LOAD_DIR + "fall11_urls.txt", "r", encoding="iso-8859-1") as urls_file:
-        wnid_old = None
+def _read_images(directory):
+    """
+    Yield image rows from the fall11_urls.txt file.
+    The last seen date of an image is not part of the file, so a random date in late 2011 is used instead.
+    """
+    with open(directory + "fall11_urls.txt", "r", encoding="iso-8859-1") as urls_file:
         for urls_line in urls_file:
-            wnid_imid, url = urls_line.split(sep="\t", maxsplit=1)
+            wnid_imid, url = urls_line.rstrip("\n").split(sep="\t", maxsplit=1)
             wnid, imid = wnid_imid.split(sep="_", maxsplit=1)
-            url = url[:-1]
-
-            if wnid != wnid_old:
-                synset = Synset.query.filter_by(wnid=wnid).first()
-                wnid_old = wnid
-                db.session.commit()
-
-            image = Image(
-                imid=imid,
-                url=url,
-                date=datetime(2011, randint(9, 12), randint(1, 30)).isoformat().split("T")[0],
-                synset=synset
-            )
-            db.session.add(image)
-        db.session.commit()
 
-    with open(DB_LOAD_DIR + "wordnet.is_a.txt", "r") as hyponyms_file:
-        wnid_old = None
+            yield {
+                "synset_wnid": wnid,
+                "imid": int(imid),
+                "url": url,
+                "date": "2011-{:02d}-{:02d}".format(randint(9, 12), randint(1, 30))
+            }
+
+def _read_hyponyms(directory, wnids, skipped):
+    """
+    Yield hyponym rows from the wordnet.is_a.txt file.
+    Both WordNet IDs of an edge are validated against the passed set of known WordNet IDs,
+    so no synset needs to be looked up from the database.
+    Lines with unknown WordNet IDs as well as duplicate lines are appended to the passed list instead.
+    """
+    edges = set()
+    with open(directory + "wordnet.is_a.txt", "r") as hyponyms_file:
         for hyponyms_line in hyponyms_file:
+            hyponyms_line = hyponyms_line.rstrip("\n")
             wnid, wnid_hyponym = hyponyms_line.split(sep=" ", maxsplit=1)
-            wnid_hyponym = wnid_hyponym[:-1]
 
-            if wnid != wnid_old:
-                synset = Synset.query.filter_by(wnid=wnid).first()
-                wnid_old = wnid
+            if wnid not in wnids or wnid_hyponym not in wnids or (wnid, wnid_hyponym) in edges:
+                skipped.append(hyponyms_line)
+                continue
+
+            edges.add((wnid, wnid_hyponym))
+            yield {"synset_wnid": wnid, "synset_hyponym_wnid": wnid_hyponym}
+
+def _load_table(connection, table, rows, batch_size):
+    """
+    Insert the rows into the table with one executemany call per batch and commit them as a single transaction.
+    Report the number of rows loaded and the rate at which they were loaded.
+    """
+    count = 0
+    time_start = perf_counter()
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        connection.execute(table.insert(), batch)
+        count += len(batch)
+        batch = list(islice(rows, batch_size))
+    connection.commit()
+    elapsed = perf_counter() - time_start
 
-            synset_hyponym = Synset.query.filter_by(wnid=wnid_hyponym).first()
-            synset.hyponyms.append(synset_hyponym)
-        db.session.commit()
+    click.echo("Loaded {} rows into '{}' in {:.1f} s ({:.0f} rows/s)".format(
+        count, table.name, elapsed, count / elapsed if elapsed else 0
+    ))
+    return count
@@ -0,0 +1,80 @@
+"""
+Opt-in profiling of individual requests with cProfile, for finding out where the time of a slow request goes in production.
+A request is profiled if it carries the PROFILING_SECRET in the PROFILE_HEADER header, or if it is picked by the PROFILING_SAMPLE_RATE.
+The profile of each request is written as a pstats file into the PROFILING_DIR directory, by default 'profiles' in the instance folder,
+to be inspected with e.g. 'python -m pstats' or snakeviz.
+The middleware is only installed when PROFILING is enabled, so that requests pay nothing for it otherwise.
+"""
+import cProfile
+import hmac
+import os
+import random
+from time import perf_counter, time
+from imagenet_browser.constants import *
+
+class ProfilerMiddleware(object):
+    """
+    WSGI middleware that profiles the requests picked either by the secret header or by sampling.
+    The profile covers the whole application, including routing, the request hooks, and serializing the response,
+    for which the response body is collected before it is returned, and as such streamed responses are buffered when profiled.
+    """
+
+    def __init__(self, app, wsgi_app, directory, secret=None, sample_rate=0.0):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.header = "HTTP_" + PROFILE_HEADER.upper().replace("-", "_")
+        self.secret = secret
+        self.sample_rate = sample_rate
+        os.makedirs(directory, exist_ok=True)
+
+    def is_profiled(self, environ):
+        """
+        Return whether the request is to be profiled.
+        The secret is compared in constant time so that it cannot be guessed from the response times.
+        """
+        value = environ.get(self.header)
+        if value is not None and self.secret and hmac.compare_digest(value.encode(), self.secret.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self.is_profiled(environ):
+            return self.wsgi_app(environ, start_response)
+
+        body = []
+
+        def run_app():
+            app_iter = self.wsgi_app(environ, start_response)
+            try:
+                body.extend(app_iter)
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+
+        profile = cProfile.Profile()
+        time_start = perf_counter()
+        profile.runcall(run_app)
+        elapsed = perf_counter() - time_start
+
+        fname = "{}.{}.{:.0f}ms.{:.0f}.prof".format(
+            environ["REQUEST_METHOD"],
+            environ.get("PATH_INFO").strip("/").replace("/", ".") or "root",
+            elapsed * 1000,
+            time() * 1000
+        )
+        profile.dump_stats(os.path.join(self.directory, fname))
+        self.app.logger.info("Profiled %s %s into '%s'", environ["REQUEST_METHOD"], environ.get("PATH_INFO"), fname)
+        return body
+
+def init_app(app):
+    """
+    Install the profiling middleware in front of the WSGI application.
+    """
+    app.wsgi_app = ProfilerMiddleware(
+        app,
+        app.wsgi_app,
+        app.config["PROFILING_DIR"] or os.path.join(app.instance_path, "profiles"),
+        app.config["PROFILING_SECRET"],
+        app.config["PROFILING_SAMPLE_RATE"]
+    )
@@ -1,13 +1,21 @@
+import csv
 import json
 from datetime import datetime
-from jsonschema import validate, ValidationError
-from flask import Response, request, url_for
+from io import StringIO
+from re import match
+from jsonschema import ValidationError
+from flask import Response, request, stream_with_context
 from flask_restful import Resource
+from sqlalchemy import literal, select, tuple_, union_all
 from sqlalchemy.exc import IntegrityError
-from imagenet_browser.models import Synset, Image
+from imagenet_browser.models import Synset, Image, Counter, synset_closure, update_image_counts, bump_versions, update_row_counts
 from imagenet_browser import db
-from imagenet_browser.utils import ImagenetBrowserBuilder, create_error_response
+from imagenet_browser.utils import (
+    ImagenetBrowserBuilder, create_error_response, encode_cursor, get_page_args, validate_json, serialize_json, href_for,
+    HrefBuilder, conditional_get, get_write_lock, serialized_write
+)
 from imagenet_browser.constants import *
+from imagenet_browser.cache import cached_get, get_synset_tags, invalidate_responses
 
 class SynsetImageCollection(Resource):
     """
@@ -16,20 +24,23 @@ class SynsetImageCollection(Resource):
     All images of a synset.
     """
 
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "image")
     def get(self, wnid):
         """
         Build and return a list of all images of the synset.
-        A list has IMAGE_PAGE_SIZE items with the starting index being controlled by the query parameter.
-        As such, the next and prev controls become available when appropriate.
+        A list has IMAGE_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        Whether there is a next page is decided by fetching one item more than fits on a page.
+        The cursor holds the WordNet ID of the synset too, and as such a cursor of another synset is rejected.
+        The total number of images is the image count of the synset.
         """
         try:
-            start = int(request.args.get("start", default=0))
-        except ValueError:
-            return create_error_response(
-                400,
-                "Invalid query parameter",
-                "Query parameter 'start' must be an integer"
-            )
+            start, after = get_page_args(str, int)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+        if after is not None and after[0] != wnid:
+            return create_error_response(400, "Invalid query parameter", "Query parameter 'after' must be a cursor of the synset's images")
 
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -42,34 +53,49 @@ class SynsetImageCollection(Resource):
         body = ImagenetBrowserBuilder()
 
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsetimagecollection", wnid=wnid) + "?start={}".format(start))
+        if after is not None:
+            body.add_control("self", href_for("api.synsetimagecollection", wnid=wnid) + "?after={}".format(encode_cursor(after)))
+        else:
+            body.add_control("self", href_for("api.synsetimagecollection", wnid=wnid) + "?start={}".format(start))
         body.add_control_add_image(wnid=wnid)
-        body.add_control("imagenet_browser:synsetitem", url_for("api.synsetitem", wnid=wnid))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
 
-        images = Image.query.filter(Image.synset_wnid == wnid).order_by(Image.imid).offset(start)
+        images = Image.query.filter(Image.synset_wnid == wnid).order_by(Image.imid)
+        if after is not None:
+            images = images.filter(Image.imid > after[1])
+        else:
+            images = images.offset(start)
+            if start >= IMAGE_PAGE_SIZE:
+                body.add_control("prev", href_for("api.synsetimagecollection", wnid=wnid) + "?start={}".format(start - IMAGE_PAGE_SIZE))
 
-        if start >= IMAGE_PAGE_SIZE:
-            body.add_control("prev", url_for("api.synsetimagecollection", wnid=wnid) + "?start={}".format(start - IMAGE_PAGE_SIZE))
-        if images.count() > IMAGE_PAGE_SIZE:
-            body.add_control("next", url_for("api.synsetimagecollection", wnid=wnid) + "?start={}".format(start + IMAGE_PAGE_SIZE))
+        images = images.limit(IMAGE_PAGE_SIZE + 1).all()
 
+        body["total"] = synset.image_count
         body["items"] = []
-        for image in images.limit(IMAGE_PAGE_SIZE):
+        hrefs = HrefBuilder()
+        for image in images[:IMAGE_PAGE_SIZE]:
             item = ImagenetBrowserBuilder(
                 imid=image.imid,
                 url=image.url,
                 date=image.date
             )
-            item.add_control("self", url_for("api.synsetimageitem", wnid=wnid, imid=image.imid))
+            item.add_control("self", hrefs("api.synsetimageitem", wnid=wnid, imid=image.imid))
             item.add_control("profile", IMAGE_PROFILE)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        if len(images) > IMAGE_PAGE_SIZE:
+            body.add_control("next", href_for("api.synsetimagecollection", wnid=wnid) + "?after={}".format(
+                encode_cursor([image.synset_wnid, image.imid])
+            ))
 
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+    @serialized_write
     def post(self, wnid):
         """
         Add a new image to the synset and return its location in the response headers.
         The image representation must be valid against the image schema.
+        The image counts of the synset and its ancestors are incremented.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -87,14 +113,16 @@ class SynsetImageCollection(Resource):
             )
 
         try:
-            validate(request.json, Image.get_schema())
+            validate_json(request.json, Image.get_validator())
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
         try:
-            request.json["date"]
+            request.json["date"] = Image.normalize_date(request.json["date"])
         except KeyError:
             request.json["date"] = datetime.now().isoformat().split("T")[0]
+        except ValueError as e:
+            return create_error_response(400, "Invalid JSON document", str(e))
 
         image = Image(
             imid=request.json["imid"],
@@ -105,6 +133,10 @@ class SynsetImageCollection(Resource):
 
         try:
             db.session.add(image)
+            db.session.flush()
+            update_image_counts(wnid, 1)
+            bump_versions(db.session, ["image"])
+            update_row_counts(db.session, {"image": 1})
             db.session.commit()
         except IntegrityError:
             return create_error_response(
@@ -115,8 +147,10 @@ class SynsetImageCollection(Resource):
                 )
             )
 
+        invalidate_responses("images", *get_synset_tags(ancestors_of=[wnid]))
+
         return Response(status=201, headers={
-            "Location": url_for("api.synsetimageitem", wnid=wnid, imid=request.json["imid"])
+            "Location": href_for("api.synsetimageitem", wnid=wnid, imid=request.json["imid"])
         })
 
 class SynsetImageItem(Resource):
@@ -126,6 +160,8 @@ class SynsetImageItem(Resource):
     An image of a synset identified by its numerical ID.
     """
 
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "image")
     def get(self, wnid, imid):
         """
         Build and return the image representation.
@@ -144,15 +180,16 @@ class SynsetImageItem(Resource):
             date=image.date
         )
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsetimageitem", wnid=wnid, imid=imid))
+        body.add_control("self", href_for("api.synsetimageitem", wnid=wnid, imid=imid))
         body.add_control("profile", IMAGE_PROFILE)
-        body.add_control("collection", url_for("api.synsetimagecollection", wnid=wnid))
+        body.add_control("collection", href_for("api.synsetimagecollection", wnid=wnid))
         body.add_control_edit_image(wnid=wnid, imid=imid)
         body.add_control_delete_image(wnid=wnid, imid=imid)
-        body.add_control("imagecollection", url_for("api.imagecollection"))
+        body.add_control("imagecollection", href_for("api.imagecollection"))
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(serialize_json(body), 200, mimetype=MASON)
 
+    @serialized_write
     def put(self, wnid, imid):
         """
         Replace the image representation with a new one.
@@ -174,20 +211,23 @@ class SynsetImageItem(Resource):
             )
 
         try:
-            validate(request.json, Image.get_schema())
+            validate_json(request.json, Image.get_validator())
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
         try:
-            request.json["date"]
+            request.json["date"] = Image.normalize_date(request.json["date"])
         except KeyError:
             request.json["date"] = image.date
+        except ValueError as e:
+            return create_error_response(400, "Invalid JSON document", str(e))
 
         image.imid = request.json["imid"]
         image.url = request.json["url"]
         image.date = request.json["date"]
 
         try:
+            bump_versions(db.session, ["image"])
             db.session.commit()
         except IntegrityError:
             return create_error_response(
@@ -198,11 +238,15 @@ class SynsetImageItem(Resource):
                 )
             )
 
+        invalidate_responses("images", *get_synset_tags(ancestors_of=[wnid]))
+
         return Response(status=204)
 
+    @serialized_write
     def delete(self, wnid, imid):
         """
         Delete the image.
+        The image counts of the synset and its ancestors are decremented.
         """
         image = Image.query.filter(Image.synset_wnid == wnid, Image.imid == imid).first()
         if not image:
@@ -213,8 +257,13 @@ class SynsetImageItem(Resource):
             )
 
         db.session.delete(image)
+        update_image_counts(wnid, -1)
+        bump_versions(db.session, ["image"])
+        update_row_counts(db.session, {"image": -1})
         db.session.commit()
 
+        invalidate_responses("images", *get_synset_tags(ancestors_of=[wnid]))
+
         return Response(status=204)
 
 class ImageCollection(Resource):
@@ -224,43 +273,363 @@ class ImageCollection(Resource):
     All images known to the API.
     """
 
+    @cached_get("images")
+    @conditional_get("image")
     def get(self):
         """
         Build and return a list of all images known to the API.
-        A list has IMAGE_PAGE_SIZE items with the starting index being controlled by the query parameter.
-        As such, the next and prev controls become available when appropriate.
+        A list has IMAGE_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        Whether there is a next page is decided by fetching one item more than fits on a page.
+        The total number of images is read from the image counter.
         """
         body = ImagenetBrowserBuilder()
         
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.imagecollection"))
+        body.add_control("self", href_for("api.imagecollection"))
 
         try:
-            start = int(request.args.get("start", default=0))
-        except ValueError:
-            return create_error_response(
-                400,
-                "Invalid query parameter",
-                "Query parameter 'start' must be an integer"
-            )
+            start, after = get_page_args(str, int)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
 
-        images = Image.query.order_by(Image.synset_wnid, Image.imid).offset(start)
+        images = Image.query.order_by(Image.synset_wnid, Image.imid)
+        if after is not None:
+            images = images.filter(tuple_(Image.synset_wnid, Image.imid) > tuple_(*after))
+        else:
+            images = images.offset(start)
+            if start >= IMAGE_PAGE_SIZE:
+                body.add_control("prev", href_for("api.imagecollection") + "?start={}".format(start - IMAGE_PAGE_SIZE))
 
-        if start >= IMAGE_PAGE_SIZE:
-            body.add_control("prev", url_for("api.imagecollection") + "?start={}".format(start - IMAGE_PAGE_SIZE))
-        if images.count() > IMAGE_PAGE_SIZE:
-            body.add_control("next", url_for("api.imagecollection") + "?start={}".format(start + IMAGE_PAGE_SIZE))
+        images = images.limit(IMAGE_PAGE_SIZE + 1).all()
 
+        body["total"] = Counter.get_value("image")
         body["items"] = []
-        for image in images.limit(IMAGE_PAGE_SIZE):
+        hrefs = HrefBuilder()
+        for image in images[:IMAGE_PAGE_SIZE]:
             item = ImagenetBrowserBuilder(
                 synset_wnid=image.synset_wnid,
                 imid=image.imid,
                 url=image.url,
                 date=image.date
             )
-            item.add_control("self", url_for("api.synsetimageitem", wnid=image.synset_wnid, imid=image.imid))
+            item.add_control("self", hrefs("api.synsetimageitem", wnid=image.synset_wnid, imid=image.imid))
             item.add_control("profile", IMAGE_PROFILE)
             body["items"].append(item)
+
+        if len(images) > IMAGE_PAGE_SIZE:
+            body.add_control("next", href_for("api.imagecollection") + "?after={}".format(
+                encode_cursor([image.synset_wnid, image.imid])
+            ))
             
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class SynsetSubtreeImageCollection(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetSubtreeImageCollection resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    All images of a synset and its descendants in the is-a hierarchy.
+    """
+
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "image", "hyponyms")
+    def get(self, wnid):
+        """
+        Build and return a list of all images of the synset and its descendants.
+        A list has IMAGE_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        The synsets of the subtree are found from the closure table, and only those not preceding the cursor are searched for images.
+        The total number of images is the subtree image count of the synset.
+        """
+        try:
+            start, after = get_page_args(str, int)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        if not synset:
+            return create_error_response(
+                404,
+                "Not found",
+                "No synset with WordNet ID of '{}' found".format(wnid)
+            )
+
+        body = ImagenetBrowserBuilder()
+
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        if after is not None:
+            body.add_control("self", href_for("api.synsetsubtreeimagecollection", wnid=wnid) + "?after={}".format(encode_cursor(after)))
+        else:
+            body.add_control("self", href_for("api.synsetsubtreeimagecollection", wnid=wnid) + "?start={}".format(start))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
+
+        subtree_wnids = select(synset_closure.c.descendant_wnid).where(synset_closure.c.ancestor_wnid == wnid)
+        if after is not None:
+            subtree_wnids = subtree_wnids.where(synset_closure.c.descendant_wnid >= after[0])
+        subtree_wnids = union_all(subtree_wnids, select(literal(wnid)))
+
+        images = Image.query.filter(Image.synset_wnid.in_(subtree_wnids)).order_by(Image.synset_wnid, Image.imid)
+        if after is not None:
+            images = images.filter(tuple_(Image.synset_wnid, Image.imid) > tuple_(*after))
+        else:
+            images = images.offset(start)
+            if start >= IMAGE_PAGE_SIZE:
+                body.add_control("prev", href_for("api.synsetsubtreeimagecollection", wnid=wnid) + "?start={}".format(start - IMAGE_PAGE_SIZE))
+
+        images = images.limit(IMAGE_PAGE_SIZE + 1).all()
+
+        body["total"] = synset.subtree_image_count
+        body["items"] = []
+        hrefs = HrefBuilder()
+        for image in images[:IMAGE_PAGE_SIZE]:
+            item = ImagenetBrowserBuilder(
+                synset_wnid=image.synset_wnid,
+                imid=image.imid,
+                url=image.url,
+                date=image.date
+            )
+            item.add_control("self", hrefs("api.synsetimageitem", wnid=image.synset_wnid, imid=image.imid))
+            item.add_control("profile", IMAGE_PROFILE)
+            body["items"].append(item)
+
+        if len(images) > IMAGE_PAGE_SIZE:
+            body.add_control("next", href_for("api.synsetsubtreeimagecollection", wnid=wnid) + "?after={}".format(
+                encode_cursor([image.synset_wnid, image.imid])
+            ))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class SynsetImageBulk(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetImageBulk resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    Bulk import of images to a synset.
+    """
+
+    def post(self, wnid):
+        """
+        Add the images in the NDJSON request body to the synset and return the result of each line.
+        Each line must be an image representation valid against the image schema.
+        """
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        if not synset:
+            return create_error_response(
+                404,
+                "Not found",
+                "No synset with WordNet ID of '{}' found".format(wnid)
+            )
+
+        if request.mimetype != NDJSON:
+            return create_error_response(
+                415,
+                "Unsupported media type",
+                "Requests must be NDJSON"
+            )
+
+        body = _import_images(Image.get_validator(), wnid)
+        body.add_control("collection", href_for("api.synsetimagecollection", wnid=wnid))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class ImageBulk(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the ImageBulk resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    Bulk import of images to any synsets.
+    """
+
+    def post(self):
+        """
+        Add the images in the NDJSON request body to their synsets and return the result of each line.
+        Each line must be an image representation valid against the image schema that also requires the WordNet ID of the synset.
+        """
+        if request.mimetype != NDJSON:
+            return create_error_response(
+                415,
+                "Unsupported media type",
+                "Requests must be NDJSON"
+            )
+
+        body = _import_images(Image.get_validator(with_wnid=True))
+        body.add_control("collection", href_for("api.imagecollection"))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+def _import_images(validator, wnid=None):
+    """
+    Read the request body line by line, validating each non-empty line, and insert the valid images in batches of IMAGE_BULK_BATCH_SIZE,
+    each batch in its own transaction.
+    The images are added to the synset if one is given, or otherwise to the synsets given on each line.
+    Return a hypermedia response body with the number of added and rejected images and the result of each line,
+    the status of which is 201 for an added image, 400 for an invalid line, 404 for an unknown synset, or 409 for an existing image.
+    """
+    date = datetime.now().isoformat().split("T")[0]
+    synset_exists = {wnid: True} if wnid else {}
+    results = []
+    batch = []
+    for number, line in enumerate(request.stream, 1):
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+            validate_json(document, validator)
+            if "date" in document:
+                document["date"] = Image.normalize_date(document["date"])
+        except ValidationError as e:
+            results.append({"line": number, "status": 400, "message": e.message})
+            continue
+        except ValueError as e:
+            results.append({"line": number, "status": 400, "message": str(e)})
+            continue
+
+        batch.append((number, {
+            "synset_wnid": wnid or document["synset_wnid"],
+            "imid": document["imid"],
+            "url": document["url"],
+            "date": document.get("date", date)
+        }))
+        if len(batch) == IMAGE_BULK_BATCH_SIZE:
+            _insert_images(batch, synset_exists, results)
+            batch = []
+    if batch:
+        _insert_images(batch, synset_exists, results)
+
+    results.sort(key=lambda result: result["line"])
+    added = sum(1 for result in results if result["status"] == 201)
+    body = ImagenetBrowserBuilder(added=added, rejected=len(results) - added, results=results)
+    body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+    return body
+
+def _insert_images(batch, synset_exists, results):
+    """
+    Insert a batch of (line number, image row) pairs in a single transaction along with updating the image counts,
+    and append the result of each line to the results.
+    The synsets and the existing images are looked up for the whole batch at once, and the known synsets are remembered across batches.
+    The batch is looked up and inserted under the write lock of the application, which is not held while the next batch is being read.
+    """
+    with get_write_lock():
+        unknown_wnids = set(row["synset_wnid"] for _, row in batch) - synset_exists.keys()
+        if unknown_wnids:
+            existing_wnids = set(db.session.execute(select(Synset.wnid).where(Synset.wnid.in_(unknown_wnids))).scalars())
+            for unknown_wnid in unknown_wnids:
+                synset_exists[unknown_wnid] = unknown_wnid in existing_wnids
+
+        keys = [(row["synset_wnid"], row["imid"]) for _, row in batch if synset_exists[row["synset_wnid"]]]
+        existing_keys = set(tuple(key) for key in db.session.execute(
+            select(Image.synset_wnid, Image.imid).where(tuple_(Image.synset_wnid, Image.imid).in_(keys))
+        ))
+
+        rows = []
+        batch_results = []
+        deltas = {}
+        for number, row in batch:
+            key = (row["synset_wnid"], row["imid"])
+            result = {"line": number, "synset_wnid": row["synset_wnid"], "imid": row["imid"]}
+            if not synset_exists[row["synset_wnid"]]:
+                result.update(status=404, message="No synset with WordNet ID of '{}' found".format(row["synset_wnid"]))
+            elif key in existing_keys:
+                result.update(status=409, message="Image with WordNet ID of '{}' and image ID of '{}' already exists".format(*key))
+            else:
+                existing_keys.add(key)
+                rows.append(row)
+                deltas[row["synset_wnid"]] = deltas.get(row["synset_wnid"], 0) + 1
+                result.update(status=201)
+            batch_results.append(result)
+
+        if rows:
+            try:
+                db.session.execute(Image.__table__.insert(), rows)
+                for synset_wnid, delta in deltas.items():
+                    update_image_counts(synset_wnid, delta)
+                bump_versions(db.session, ["image"])
+                update_row_counts(db.session, {"image": len(rows)})
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                synset_exists.clear()
+                for result in batch_results:
+                    if result["status"] == 201:
+                        result.update(status=409, message="Batch was not added due to a concurrent change")
+            else:
+                invalidate_responses("images", *get_synset_tags(ancestors_of=list(deltas)))
+
+    results.extend(batch_results)
+
+class ImageExport(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the ImageExport resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    All images known to the API as a single NDJSON or CSV document.
+    """
+
+    @conditional_get("synset", "image", "hyponyms")
+    def get(self):
+        """
+        Stream all images ordered by their WordNet ID and image ID in the format given by the 'format' query parameter, either 'ndjson' or 'csv'.
+        The images can be limited to those of the synset given by the 'wnid' query parameter and its descendants,
+        and to those last seen within the dates given by the 'date_from' and 'date_to' query parameters, both included.
+        The dates of the images are stored zero-padded, and as such the dates compare correctly as strings.
+        The rows are fetched from a streamed result EXPORT_CHUNK_SIZE rows at a time and each chunk is sent as soon as it is formatted,
+        so the memory used does not depend on the number of images.
+        """
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in ("ndjson", "csv"):
+            return create_error_response(400, "Invalid query parameter", "Query parameter 'format' must be either 'ndjson' or 'csv'")
+
+        images = select(Image.synset_wnid, Image.imid, Image.url, Image.date).order_by(Image.synset_wnid, Image.imid)
+        for arg, compare in (("date_from", Image.date.__ge__), ("date_to", Image.date.__le__)):
+            date = request.args.get(arg)
+            if date is not None:
+                try:
+                    if not match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$", date):
+                        raise ValueError
+                    date = Image.normalize_date(date)
+                except ValueError:
+                    return create_error_response(400, "Invalid query parameter", "Query parameter '{}' must be a date as YYYY-MM-DD".format(arg))
+                images = images.where(compare(date))
+
+        wnid = request.args.get("wnid")
+        if wnid is not None:
+            synset = Synset.query.filter_by(wnid=wnid).first()
+            if not synset:
+                return create_error_response(
+                    404,
+                    "Not found",
+                    "No synset with WordNet ID of '{}' found".format(wnid)
+                )
+            subtree_wnids = union_all(
+                select(synset_closure.c.descendant_wnid).where(synset_closure.c.ancestor_wnid == wnid),
+                select(literal(wnid))
+            )
+            images = images.where(Image.synset_wnid.in_(subtree_wnids))
+
+        if export_format == "csv":
+            return Response(stream_with_context(_export_csv(images)), 200, mimetype="text/csv")
+        return Response(stream_with_context(_export_ndjson(images)), 200, mimetype=NDJSON)
+
+def _export_ndjson(images):
+    """
+    Generate the images selected by the statement as chunks of NDJSON lines.
+    """
+    for rows in db.session.execute(images, execution_options={"yield_per": EXPORT_CHUNK_SIZE}).partitions():
+        lines = []
+        for synset_wnid, imid, url, date in rows:
+            line = serialize_json({"synset_wnid": synset_wnid, "imid": imid, "url": url, "date": date})
+            lines.append(line if isinstance(line, bytes) else line.encode())
+        lines.append(b"")
+        yield b"\n".join(lines)
+
+def _export_csv(images):
+    """
+    Generate the images selected by the statement as chunks of CSV lines, the first of which is the header.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["synset_wnid", "imid", "url", "date"])
+    for rows in db.session.execute(images, execution_options={"yield_per": EXPORT_CHUNK_SIZE}).partitions():
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
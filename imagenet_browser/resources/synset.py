@@ -1,12 +1,23 @@
-import json
-from jsonschema import validate, ValidationError
-from flask import Response, request, url_for
+from urllib.parse import urlencode
+from jsonschema import ValidationError
+from flask import Response, request
 from flask_restful import Resource
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from imagenet_browser import db
-from imagenet_browser.models import Synset, Image
+from imagenet_browser.models import (
+    Synset, Image, Counter, hyponyms, synset_closure, add_synset_closure, remove_synset_closure,
+    get_ancestor_wnids, refresh_subtree_image_counts, index_synset, unindex_synset, search_synsets, bump_versions, update_row_counts,
+    get_versions, VERSIONED_TABLES
+)
 from imagenet_browser.constants import *
-from imagenet_browser.utils import ImagenetBrowserBuilder, create_error_response
+from imagenet_browser.autocomplete import get_word_index, update_word_index
+from imagenet_browser.cache import cached_get, get_synset_tags, invalidate_responses
+from imagenet_browser.hierarchy import get_hierarchy_snapshot
+from imagenet_browser.utils import (
+    ImagenetBrowserBuilder, create_error_response, encode_cursor, get_page_args, validate_json, serialize_json, href_for,
+    HrefBuilder, conditional_get, serialized_write
+)
 
 class SynsetCollection(Resource):
     """
@@ -15,51 +26,80 @@ class SynsetCollection(Resource):
     All synsets known to the API.
     """
 
+    @cached_get("synsets")
+    @conditional_get("synset")
     def get(self):
         """
         Build and return a list of all synsets known to the API.
-        A list has SYNSET_PAGE_SIZE items with the starting index being controlled by the query parameter.
-        As such, the next and prev controls become available when appropriate.
+        A list has SYNSET_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        Whether there is a next page is decided by fetching one item more than fits on a page.
+        The total number of synsets is read from the synset counter.
+        If the 'q' query parameter is given, the list instead has the synsets matching it in the full-text search index,
+        ranked by relevance, in which case only the starting index controls the page.
         """
         try:
-            start = int(request.args.get("start", default=0))
-        except ValueError:
+            start, after = get_page_args(str)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        query = request.args.get("q")
+        if query is not None and not query.split():
             return create_error_response(
                 400,
                 "Invalid query parameter",
-                "Query parameter 'start' must be an integer"
+                "Query parameter 'q' must have at least one search term"
             )
 
         body = ImagenetBrowserBuilder()
         
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsetcollection"))
+        body.add_control("self", href_for("api.synsetcollection"))
         body.add_control_add_synset()
 
-        synsets = Synset.query.order_by(Synset.wnid).offset(start)
+        if query is not None:
+            search_url = href_for("api.synsetcollection") + "?" + urlencode({"q": query})
+            synsets = search_synsets(query, start, SYNSET_PAGE_SIZE + 1)
+            if start >= SYNSET_PAGE_SIZE:
+                body.add_control("prev", search_url + "&start={}".format(start - SYNSET_PAGE_SIZE))
+        else:
+            synsets = Synset.query.order_by(Synset.wnid)
+            if after is not None:
+                synsets = synsets.filter(Synset.wnid > after[0])
+            else:
+                synsets = synsets.offset(start)
+                if start >= SYNSET_PAGE_SIZE:
+                    body.add_control("prev", href_for("api.synsetcollection") + "?start={}".format(start - SYNSET_PAGE_SIZE))
 
-        if start >= SYNSET_PAGE_SIZE:
-            body.add_control("prev", url_for("api.synsetcollection") + "?start={}".format(start - SYNSET_PAGE_SIZE))
-        if synsets.count() > SYNSET_PAGE_SIZE:
-            body.add_control("next", url_for("api.synsetcollection") + "?start={}".format(start + SYNSET_PAGE_SIZE))
+            synsets = synsets.limit(SYNSET_PAGE_SIZE + 1).all()
+            body["total"] = Counter.get_value("synset")
 
         body["items"] = []
-        for synset in synsets.limit(SYNSET_PAGE_SIZE):
+        hrefs = HrefBuilder()
+        for synset in synsets[:SYNSET_PAGE_SIZE]:
             item = ImagenetBrowserBuilder(
                 wnid=synset.wnid,
                 words=synset.words,
                 gloss=synset.gloss
             )
-            item.add_control("self", url_for("api.synsetitem", wnid=synset.wnid))
+            item.add_control("self", hrefs("api.synsetitem", wnid=synset.wnid))
             item.add_control("profile", SYNSET_PROFILE)
             body["items"].append(item)
+
+        if len(synsets) > SYNSET_PAGE_SIZE:
+            if query is not None:
+                body.add_control("next", search_url + "&start={}".format(start + SYNSET_PAGE_SIZE))
+            else:
+                body.add_control("next", href_for("api.synsetcollection") + "?after={}".format(encode_cursor([synset.wnid])))
             
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(serialize_json(body), 200, mimetype=MASON)
 
+    @serialized_write
     def post(self):
         """
         Add a new synset and return its location in the response headers.
         The synset representation must be valid against the synset schema.
+        The synset is added to the full-text search index and to the word index.
         """
         if not request.json:
             return create_error_response(
@@ -69,7 +109,7 @@ class SynsetCollection(Resource):
             )
 
         try:
-            validate(request.json, Synset.get_schema())
+            validate_json(request.json, Synset.get_validator())
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -81,6 +121,11 @@ class SynsetCollection(Resource):
 
         try:
             db.session.add(synset)
+            db.session.flush()
+            index_synset(synset)
+            bump_versions(db.session, ["synset"])
+            update_row_counts(db.session, {"synset": 1})
+            version, = get_versions(["synset"])
             db.session.commit()
         except IntegrityError:
             return create_error_response(
@@ -89,10 +134,55 @@ class SynsetCollection(Resource):
                 "Synset with WordNet ID of '{}' already exists".format(request.json["wnid"])
             )
 
+        update_word_index(version, added=[(request.json["wnid"], request.json["words"])])
+        invalidate_responses("synsets")
+
         return Response(status=201, headers={
-            "Location": url_for("api.synsetitem", wnid=request.json["wnid"])
+            "Location": href_for("api.synsetitem", wnid=request.json["wnid"])
         })
 
+class SynsetAutocomplete(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetAutocomplete resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    The word phrases of the synsets that complete a prefix.
+    """
+
+    @cached_get("synsets")
+    @conditional_get("synset")
+    def get(self):
+        """
+        Build and return a list of at most AUTOCOMPLETE_LIMIT word phrases starting with the 'prefix' query parameter, in alphabetical order.
+        The matching is case-insensitive, and each item has the WordNet IDs of the synsets having the word phrase.
+        The word phrases are found by bisecting the word index rather than by a LIKE query on the words,
+        so that apart from the version query of the entity tag the database is only queried when the index needs to be built.
+        """
+        prefix = request.args.get("prefix", "").strip()
+        if not prefix:
+            return create_error_response(
+                400,
+                "Invalid query parameter",
+                "Query parameter 'prefix' must not be empty"
+            )
+
+        body = ImagenetBrowserBuilder(prefix=prefix)
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        body.add_control("self", href_for("api.synsetautocomplete") + "?" + urlencode({"prefix": prefix}))
+        body.add_control("collection", href_for("api.synsetcollection"))
+
+        body["items"] = []
+        hrefs = HrefBuilder()
+        for phrase, wnids in get_word_index().complete(prefix, AUTOCOMPLETE_LIMIT):
+            item = ImagenetBrowserBuilder(
+                phrase=phrase,
+                wnids=wnids
+            )
+            item.add_control("self", hrefs("api.synsetitem", wnid=wnids[0]))
+            item.add_control("profile", SYNSET_PROFILE)
+            body["items"].append(item)
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
 class SynsetItem(Resource):
     """
     Subclass of Resource that defines the HTTP method handlers for the SynsetItem resource.
@@ -100,9 +190,12 @@ class SynsetItem(Resource):
     A synset identified by its WordNet ID.
     """
 
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "image", "hyponyms")
     def get(self, wnid):
         """
         Build and return the synset representation.
+        Besides the synset's own properties, the representation has the number of images of the synset and of its subtree.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -115,23 +208,31 @@ class SynsetItem(Resource):
         body = ImagenetBrowserBuilder(
             wnid=wnid,
             words=synset.words,
-            gloss=synset.gloss
+            gloss=synset.gloss,
+            image_count=synset.image_count,
+            subtree_image_count=synset.subtree_image_count
         )
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsetitem", wnid=wnid))
+        body.add_control("self", href_for("api.synsetitem", wnid=wnid))
         body.add_control("profile", SYNSET_PROFILE)
-        body.add_control("collection", url_for("api.synsetcollection"))
+        body.add_control("collection", href_for("api.synsetcollection"))
         body.add_control_edit_synset(wnid=wnid)
         body.add_control_delete_synset(wnid=wnid)
-        body.add_control("imagenet_browser:synsethyponymcollection", url_for("api.synsethyponymcollection", wnid=wnid))
-        body.add_control("imagenet_browser:synsetimagecollection", url_for("api.synsetimagecollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsethyponymcollection", href_for("api.synsethyponymcollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsetimagecollection", href_for("api.synsetimagecollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsetdescendantcollection", href_for("api.synsetdescendantcollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsetancestorcollection", href_for("api.synsetancestorcollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsetsubtreeimagecollection", href_for("api.synsetsubtreeimagecollection", wnid=wnid))
+        body.add_control("imagenet_browser:synsetpath", href_for("api.synsetpath", wnid=wnid))
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(serialize_json(body), 200, mimetype=MASON)
 
+    @serialized_write
     def put(self, wnid):
         """
         Replace the synset representation with a new one.
         Must validate against the synset schema.
+        The synset is reindexed in the full-text search index and in the word index.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -149,15 +250,21 @@ class SynsetItem(Resource):
             )
 
         try:
-            validate(request.json, Synset.get_schema())
+            validate_json(request.json, Synset.get_validator())
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
+        words_old = synset.words
         synset.wnid = request.json["wnid"]
         synset.words = request.json["words"]
         synset.gloss = request.json["gloss"]
 
         try:
+            db.session.flush()
+            unindex_synset(wnid)
+            index_synset(synset)
+            bump_versions(db.session, VERSIONED_TABLES)
+            version, = get_versions(["synset"])
             db.session.commit()
         except IntegrityError:
             return create_error_response(
@@ -166,11 +273,20 @@ class SynsetItem(Resource):
                 "Synset with WordNet ID of '{}' already exists".format(request.json["wnid"])
             )
 
+        update_word_index(version, removed=[(wnid, words_old)], added=[(request.json["wnid"], request.json["words"])])
+        tags = get_synset_tags(ancestors_of=[request.json["wnid"]], descendants_of=[request.json["wnid"]])
+        if request.json["wnid"] != wnid:
+            tags.update(["images", "synset:" + wnid])
+        invalidate_responses("synsets", *tags)
+
         return Response(status=204)
 
+    @serialized_write
     def delete(self, wnid):
         """
         Delete the synset and its associated images.
+        The hyponyms of the synset are removed first, all at once, so that the closure table no longer has paths going through the synset.
+        The subtree image counts of the former ancestors are recomputed afterwards, and the synset is removed from the full-text search index and from the word index.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -180,9 +296,28 @@ class SynsetItem(Resource):
                 "No synset with WordNet ID of '{}' found".format(wnid)
             )
 
+        ancestor_wnids = get_ancestor_wnids(wnid)[:-1]
+        tags = get_synset_tags(ancestors_of=[wnid], descendants_of=[wnid])
+        hyponym_wnids = db.session.execute(
+            select(hyponyms.c.synset_hyponym_wnid).where(hyponyms.c.synset_wnid == wnid)
+        ).scalars().all()
+        db.session.execute(hyponyms.delete().where(hyponyms.c.synset_wnid == wnid))
+        if hyponym_wnids:
+            remove_synset_closure(wnid, *hyponym_wnids)
+
         db.session.delete(synset)
+        db.session.flush()
+        refresh_subtree_image_counts(db.session, ancestor_wnids)
+        unindex_synset(wnid)
+        bump_versions(db.session, VERSIONED_TABLES)
+        update_row_counts(db.session, {"synset": -1, "image": -synset.image_count})
+        version, = get_versions(["synset"])
+        words = synset.words
         db.session.commit()
 
+        update_word_index(version, removed=[(wnid, words)])
+        invalidate_responses("synsets", "images", *tags)
+
         return Response(status=204)
 
 
@@ -193,20 +328,20 @@ class SynsetHyponymCollection(Resource):
     All hyponyms of a synset.
     """
 
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "hyponyms")
     def get(self, wnid):
         """
         Build and return a list of all hyponyms of the synset.
-        A list has SYNSET_PAGE_SIZE items with the starting index being controlled by the query parameter.
-        As such, the next and prev controls become available when appropriate.
+        A list has SYNSET_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        The page is queried from the hyponyms table joined with the synset table rather than loaded through the relationship,
+        so only the hyponyms on the page are fetched.
         """
         try:
-            start = int(request.args.get("start", default=0))
-        except ValueError:
-            return create_error_response(
-                400,
-                "Invalid query parameter",
-                "Query parameter 'start' must be an integer"
-            )
+            start, after = get_page_args(str)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
 
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -222,34 +357,52 @@ class SynsetHyponymCollection(Resource):
             gloss=synset.gloss
         )
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsethyponymcollection", wnid=wnid) + "?start={}".format(start))
+        if after is not None:
+            body.add_control("self", href_for("api.synsethyponymcollection", wnid=wnid) + "?after={}".format(encode_cursor(after)))
+        else:
+            body.add_control("self", href_for("api.synsethyponymcollection", wnid=wnid) + "?start={}".format(start))
         body.add_control_add_hyponym(wnid=wnid)
-        body.add_control("imagenet_browser:synsetitem", url_for("api.synsetitem", wnid=wnid))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
 
-        synset_hyponyms = synset.hyponyms[start:]
+        synset_hyponyms = Synset.query.join(hyponyms, hyponyms.c.synset_hyponym_wnid == Synset.wnid).filter(
+            hyponyms.c.synset_wnid == wnid
+        ).order_by(hyponyms.c.synset_hyponym_wnid)
+        if after is not None:
+            synset_hyponyms = synset_hyponyms.filter(hyponyms.c.synset_hyponym_wnid > after[0])
+        else:
+            synset_hyponyms = synset_hyponyms.offset(start)
+            if start >= SYNSET_PAGE_SIZE:
+                body.add_control("prev", href_for("api.synsethyponymcollection", wnid=wnid) + "?start={}".format(start - SYNSET_PAGE_SIZE))
 
-        if start >= SYNSET_PAGE_SIZE:
-            body.add_control("prev", url_for("api.synsethyponymcollection", wnid=wnid) + "?start={}".format(start - SYNSET_PAGE_SIZE))
-        if len(synset_hyponyms) > SYNSET_PAGE_SIZE:
-            body.add_control("next", url_for("api.synsethyponymcollection", wnid=wnid) + "?start={}".format(start + SYNSET_PAGE_SIZE))
+        synset_hyponyms = synset_hyponyms.limit(SYNSET_PAGE_SIZE + 1).all()
 
         body["items"] = []
+        hrefs = HrefBuilder()
         for synset_hyponym in synset_hyponyms[:SYNSET_PAGE_SIZE]:
             item = ImagenetBrowserBuilder(
                 wnid=synset_hyponym.wnid,
                 words=synset_hyponym.words,
                 gloss=synset_hyponym.gloss
             )
-            item.add_control("self", url_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=synset_hyponym.wnid))
+            item.add_control("self", hrefs("api.synsethyponymitem", wnid=wnid, hyponym_wnid=synset_hyponym.wnid))
             item.add_control("profile", SYNSET_PROFILE)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        if len(synset_hyponyms) > SYNSET_PAGE_SIZE:
+            body.add_control("next", href_for("api.synsethyponymcollection", wnid=wnid) + "?after={}".format(
+                encode_cursor([synset_hyponym.wnid])
+            ))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
 
+    @serialized_write
     def post(self, wnid):
         """
         Add a new hyponym to the synset with the hyponym being a previously added synset and return its location in the response headers.
         The synset representation must be valid against a subset of the synset schema that only requires the WordNet ID.
+        The hyponym is probed for and inserted directly in the hyponyms table rather than through the relationship.
+        The hyponym must not be the synset itself or one of its ancestors, as the is-a hierarchy would then have a cycle.
+        The closure table and the subtree image counts of the synset and its ancestors are updated to reflect the new paths.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -267,7 +420,7 @@ class SynsetHyponymCollection(Resource):
             )
 
         try:
-            validate(request.json, Synset.get_schema(wnid_only=True))
+            validate_json(request.json, Synset.get_validator(wnid_only=True))
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -279,22 +432,42 @@ class SynsetHyponymCollection(Resource):
                 "No synset with WordNet ID of '{}' found".format(request.json["wnid"])
             )
 
-        try:
-            synset.hyponyms.index(synset_hyponym)
-        except ValueError:
-            pass
-        else:
+        hyponym_exists = db.session.query(
+            select(hyponyms).where(
+                hyponyms.c.synset_wnid == wnid,
+                hyponyms.c.synset_hyponym_wnid == synset_hyponym.wnid
+            ).exists()
+        ).scalar()
+        if hyponym_exists:
             return create_error_response(
                 409,
                 "Already exists",
                 "Synset hyponym with WordNet ID of '{}' already exists".format(request.json["wnid"])
             )
 
-        synset.hyponyms.append(synset_hyponym)
+        creates_cycle = synset_hyponym.wnid == wnid or db.session.query(
+            select(synset_closure).where(
+                synset_closure.c.ancestor_wnid == synset_hyponym.wnid,
+                synset_closure.c.descendant_wnid == wnid
+            ).exists()
+        ).scalar()
+        if creates_cycle:
+            return create_error_response(
+                409,
+                "Cycle in hierarchy",
+                "Synset with WordNet ID of '{}' is the synset itself or one of its ancestors".format(request.json["wnid"])
+            )
+
+        db.session.execute(hyponyms.insert().values(synset_wnid=wnid, synset_hyponym_wnid=synset_hyponym.wnid))
+        add_synset_closure(wnid, synset_hyponym.wnid)
+        refresh_subtree_image_counts(db.session, get_ancestor_wnids(wnid))
+        bump_versions(db.session, ["hyponyms"])
         db.session.commit()
 
+        invalidate_responses(*get_synset_tags(ancestors_of=[wnid], descendants_of=[request.json["wnid"]]))
+
         return Response(status=201, headers={
-            "Location": url_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=request.json["wnid"])
+            "Location": href_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=request.json["wnid"])
         })
 
 class SynsetHyponymItem(Resource):
@@ -304,9 +477,12 @@ class SynsetHyponymItem(Resource):
     A hyponym of a synset identified by its WordNet ID.
     """
 
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "hyponyms")
     def get(self, wnid, hyponym_wnid):
         """
         Build and return the hyponym representation.
+        The hyponym is queried from the hyponyms table joined with the synset table rather than found through the relationship.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -316,11 +492,11 @@ class SynsetHyponymItem(Resource):
                 "No synset with WordNet ID of '{}' found".format(wnid)
             )
 
-        synset_hyponym = Synset.query.filter_by(wnid=hyponym_wnid).first()
-
-        try:
-            synset.hyponyms.index(synset_hyponym)
-        except ValueError:
+        synset_hyponym = Synset.query.join(hyponyms, hyponyms.c.synset_hyponym_wnid == Synset.wnid).filter(
+            hyponyms.c.synset_wnid == wnid,
+            hyponyms.c.synset_hyponym_wnid == hyponym_wnid
+        ).first()
+        if not synset_hyponym:
             return create_error_response(
                 404,
                 "Not found",
@@ -333,16 +509,20 @@ class SynsetHyponymItem(Resource):
             gloss=synset_hyponym.gloss
         )
         body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
-        body.add_control("self", url_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=hyponym_wnid))
+        body.add_control("self", href_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=hyponym_wnid))
         body.add_control("profile", SYNSET_PROFILE)
-        body.add_control("collection", url_for("api.synsethyponymcollection", wnid=wnid))
+        body.add_control("collection", href_for("api.synsethyponymcollection", wnid=wnid))
         body.add_control_delete_hyponym(wnid=wnid, hyponym_wnid=hyponym_wnid)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return Response(serialize_json(body), 200, mimetype=MASON)
 
+    @serialized_write
     def delete(self, wnid, hyponym_wnid):
         """
         Delete the hyponym.
+        The hyponym is deleted directly from the hyponyms table rather than removed through the relationship.
+        The closure table is updated to no longer have the paths that went through the removed hyponym,
+        and the subtree image counts of the synset and its ancestors are recomputed.
         """
         synset = Synset.query.filter_by(wnid=wnid).first()
         if not synset:
@@ -352,15 +532,257 @@ class SynsetHyponymItem(Resource):
                 "No synset with WordNet ID of '{}' found".format(wnid)
             )
 
-        try:
-            synset.hyponyms.remove(Synset.query.filter_by(wnid=hyponym_wnid).first())
-        except ValueError:
+        result = db.session.execute(hyponyms.delete().where(
+            hyponyms.c.synset_wnid == wnid,
+            hyponyms.c.synset_hyponym_wnid == hyponym_wnid
+        ))
+        if not result.rowcount:
             return create_error_response(
                 404,
                 "Not found",
                 "No synset hyponym with WordNet ID of '{}' found".format(hyponym_wnid)
             )
 
+        remove_synset_closure(wnid, hyponym_wnid)
+        refresh_subtree_image_counts(db.session, get_ancestor_wnids(wnid))
+        bump_versions(db.session, ["hyponyms"])
         db.session.commit()
 
+        invalidate_responses(*get_synset_tags(ancestors_of=[wnid], descendants_of=[hyponym_wnid]))
+
         return Response(status=204)
+
+class SynsetDescendantCollection(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetDescendantCollection resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    All descendants of a synset in the is-a hierarchy.
+    """
+
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "hyponyms")
+    def get(self, wnid):
+        """
+        Build and return a list of all descendants of the synset along with their depths relative to the synset.
+        A list has SYNSET_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        The page is queried from the closure table joined with the synset table, which is a single indexed lookup.
+        """
+        try:
+            start, after = get_page_args(str)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        if not synset:
+            return create_error_response(
+                404,
+                "Not found",
+                "No synset with WordNet ID of '{}' found".format(wnid)
+            )
+
+        body = ImagenetBrowserBuilder(
+            wnid=wnid,
+            words=synset.words,
+            gloss=synset.gloss
+        )
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        if after is not None:
+            body.add_control("self", href_for("api.synsetdescendantcollection", wnid=wnid) + "?after={}".format(encode_cursor(after)))
+        else:
+            body.add_control("self", href_for("api.synsetdescendantcollection", wnid=wnid) + "?start={}".format(start))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
+
+        synset_descendants = db.session.query(Synset, synset_closure.c.depth).join(
+            synset_closure, synset_closure.c.descendant_wnid == Synset.wnid
+        ).filter(
+            synset_closure.c.ancestor_wnid == wnid
+        ).order_by(synset_closure.c.descendant_wnid)
+        if after is not None:
+            synset_descendants = synset_descendants.filter(synset_closure.c.descendant_wnid > after[0])
+        else:
+            synset_descendants = synset_descendants.offset(start)
+            if start >= SYNSET_PAGE_SIZE:
+                body.add_control("prev", href_for("api.synsetdescendantcollection", wnid=wnid) + "?start={}".format(start - SYNSET_PAGE_SIZE))
+
+        synset_descendants = synset_descendants.limit(SYNSET_PAGE_SIZE + 1).all()
+
+        body["items"] = []
+        hrefs = HrefBuilder()
+        for synset_descendant, depth in synset_descendants[:SYNSET_PAGE_SIZE]:
+            item = ImagenetBrowserBuilder(
+                wnid=synset_descendant.wnid,
+                words=synset_descendant.words,
+                gloss=synset_descendant.gloss,
+                depth=depth
+            )
+            item.add_control("self", hrefs("api.synsetitem", wnid=synset_descendant.wnid))
+            item.add_control("profile", SYNSET_PROFILE)
+            body["items"].append(item)
+
+        if len(synset_descendants) > SYNSET_PAGE_SIZE:
+            body.add_control("next", href_for("api.synsetdescendantcollection", wnid=wnid) + "?after={}".format(
+                encode_cursor([synset_descendant.wnid])
+            ))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class SynsetAncestorCollection(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetAncestorCollection resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    All ancestors of a synset in the is-a hierarchy.
+    """
+
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "hyponyms")
+    def get(self, wnid):
+        """
+        Build and return a list of all ancestors of the synset along with their depths relative to the synset.
+        A list has SYNSET_PAGE_SIZE items with the starting index or the cursor being controlled by the query parameters.
+        As such, the next and prev controls become available when appropriate, the next control always using a cursor.
+        The page is queried from the closure table joined with the synset table, which is a single indexed lookup.
+        """
+        try:
+            start, after = get_page_args(str)
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        if not synset:
+            return create_error_response(
+                404,
+                "Not found",
+                "No synset with WordNet ID of '{}' found".format(wnid)
+            )
+
+        body = ImagenetBrowserBuilder(
+            wnid=wnid,
+            words=synset.words,
+            gloss=synset.gloss
+        )
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        if after is not None:
+            body.add_control("self", href_for("api.synsetancestorcollection", wnid=wnid) + "?after={}".format(encode_cursor(after)))
+        else:
+            body.add_control("self", href_for("api.synsetancestorcollection", wnid=wnid) + "?start={}".format(start))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
+
+        synset_ancestors = db.session.query(Synset, synset_closure.c.depth).join(
+            synset_closure, synset_closure.c.ancestor_wnid == Synset.wnid
+        ).filter(
+            synset_closure.c.descendant_wnid == wnid
+        ).order_by(synset_closure.c.ancestor_wnid)
+        if after is not None:
+            synset_ancestors = synset_ancestors.filter(synset_closure.c.ancestor_wnid > after[0])
+        else:
+            synset_ancestors = synset_ancestors.offset(start)
+            if start >= SYNSET_PAGE_SIZE:
+                body.add_control("prev", href_for("api.synsetancestorcollection", wnid=wnid) + "?start={}".format(start - SYNSET_PAGE_SIZE))
+
+        synset_ancestors = synset_ancestors.limit(SYNSET_PAGE_SIZE + 1).all()
+
+        body["items"] = []
+        hrefs = HrefBuilder()
+        for synset_ancestor, depth in synset_ancestors[:SYNSET_PAGE_SIZE]:
+            item = ImagenetBrowserBuilder(
+                wnid=synset_ancestor.wnid,
+                words=synset_ancestor.words,
+                gloss=synset_ancestor.gloss,
+                depth=depth
+            )
+            item.add_control("self", hrefs("api.synsetitem", wnid=synset_ancestor.wnid))
+            item.add_control("profile", SYNSET_PROFILE)
+            body["items"].append(item)
+
+        if len(synset_ancestors) > SYNSET_PAGE_SIZE:
+            body.add_control("next", href_for("api.synsetancestorcollection", wnid=wnid) + "?after={}".format(
+                encode_cursor([synset_ancestor.wnid])
+            ))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class SynsetPath(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetPath resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    The shortest path from a synset up to the root of the is-a hierarchy.
+    """
+
+    @cached_get("synset:{wnid}")
+    @conditional_get("synset", "hyponyms")
+    def get(self, wnid):
+        """
+        Build and return the path from the synset up to a synset that has no parents, along with the depth of the synset.
+        The path is found by walking the hierarchy snapshot rather than by a recursive query,
+        so that apart from the version query of the entity tag the database is only queried when the snapshot needs to be rebuilt.
+        """
+        try:
+            path = get_hierarchy_snapshot().path_to_root(wnid)
+        except (KeyError, ValueError):
+            return create_error_response(
+                404,
+                "Not found",
+                "No synset with WordNet ID of '{}' found".format(wnid)
+            )
+
+        body = ImagenetBrowserBuilder(
+            wnid=wnid,
+            depth=len(path) - 1
+        )
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        body.add_control("self", href_for("api.synsetpath", wnid=wnid))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=wnid))
+
+        body["items"] = []
+        hrefs = HrefBuilder()
+        for synset_wnid in path:
+            item = ImagenetBrowserBuilder(wnid=synset_wnid)
+            item.add_control("self", hrefs("api.synsetitem", wnid=synset_wnid))
+            item.add_control("profile", SYNSET_PROFILE)
+            body["items"].append(item)
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
+
+class SynsetLowestCommonAncestor(Resource):
+    """
+    Subclass of Resource that defines the HTTP method handlers for the SynsetLowestCommonAncestor resource.
+    Error scenarios for the various methods are described in the calls to create_error_response, or alternatively, in the resource tests.
+    The lowest common ancestor of two synsets in the is-a hierarchy.
+    """
+
+    @cached_get("synset:{wnid}", "synset:{other_wnid}")
+    @conditional_get("synset", "hyponyms")
+    def get(self, wnid, other_wnid):
+        """
+        Build and return the lowest common ancestor of the synsets, being the one with the shortest combined distance to them.
+        The lowest common ancestor is found by searching the hierarchy snapshot rather than by joining the closure table,
+        so that apart from the version query of the entity tag the database is only queried when the snapshot needs to be rebuilt.
+        """
+        snapshot = get_hierarchy_snapshot()
+        for synset_wnid in (wnid, other_wnid):
+            if synset_wnid not in snapshot:
+                return create_error_response(
+                    404,
+                    "Not found",
+                    "No synset with WordNet ID of '{}' found".format(synset_wnid)
+                )
+
+        lca_wnid = snapshot.lowest_common_ancestor(wnid, other_wnid)
+        if lca_wnid is None:
+            return create_error_response(
+                404,
+                "Not found",
+                "No common ancestor of synsets with WordNet IDs of '{}' and '{}' found".format(wnid, other_wnid)
+            )
+
+        body = ImagenetBrowserBuilder(
+            wnid=wnid,
+            other_wnid=other_wnid,
+            lca_wnid=lca_wnid
+        )
+        body.add_namespace("imagenet_browser", LINK_RELATIONS_URL)
+        body.add_control("self", href_for("api.synsetlowestcommonancestor", wnid=wnid, other_wnid=other_wnid))
+        body.add_control("imagenet_browser:synsetitem", href_for("api.synsetitem", wnid=lca_wnid))
+
+        return Response(serialize_json(body), 200, mimetype=MASON)
@@ -0,0 +1,144 @@
+"""
+Columnar snapshots of the synset, image, and hyponyms tables for analytics, written by 'flask export-snapshot'.
+Each table is written to its own Parquet file, or Arrow IPC stream, a batch of SNAPSHOT_BATCH_SIZE rows at a time,
+so that the whole image table is never held in memory.
+WordNet IDs and the hosts of the image URLs repeat a lot and are therefore dictionary encoded.
+pyarrow is an optional dependency that is only needed by this command.
+"""
+import os
+from time import perf_counter
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from imagenet_browser import db
+from imagenet_browser.constants import *
+from imagenet_browser.models import Synset, Image, hyponyms, get_versions, VERSIONED_TABLES
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError: # pragma: no cover
+    pyarrow = None
+
+SNAPSHOT_FORMATS = {"parquet": ".parquet", "arrow": ".arrows"}
+
+"""
+The regular expression for the host of an URL, used to derive the dictionary encoded host column of the image table.
+URLs without a scheme and a host get a null host.
+"""
+URL_HOST_PATTERN = r"^[A-Za-z][A-Za-z0-9+.-]*://(?P<host>[^/?#:]*)"
+
+def get_snapshot_schemas():
+    """
+    Return the Arrow schemas of the synset, image, and hyponyms tables keyed by the name of the table.
+    """
+    wnid = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    return {
+        Synset.__tablename__: pyarrow.schema([
+            ("wnid", pyarrow.string()),
+            ("words", pyarrow.string()),
+            ("gloss", pyarrow.string()),
+            ("image_count", pyarrow.int64()),
+            ("subtree_image_count", pyarrow.int64())
+        ]),
+        Image.__tablename__: pyarrow.schema([
+            ("synset_wnid", wnid),
+            ("imid", pyarrow.int64()),
+            ("url", pyarrow.string()),
+            ("url_host", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ("date", pyarrow.string())
+        ]),
+        hyponyms.name: pyarrow.schema([
+            ("synset_wnid", wnid),
+            ("synset_hyponym_wnid", wnid)
+        ])
+    }
+
+def _get_snapshot_statements():
+    """
+    Return the statements selecting the rows of the tables, ordered by their primary keys, keyed by the name of the table.
+    """
+    return {
+        Synset.__tablename__: select(
+            Synset.wnid, Synset.words, Synset.gloss, Synset.image_count, Synset.subtree_image_count
+        ).order_by(Synset.wnid),
+        Image.__tablename__: select(
+            Image.synset_wnid, Image.imid, Image.url, Image.date
+        ).order_by(Image.synset_wnid, Image.imid),
+        hyponyms.name: select(
+            hyponyms.c.synset_wnid, hyponyms.c.synset_hyponym_wnid
+        ).order_by(hyponyms.c.synset_wnid, hyponyms.c.synset_hyponym_wnid)
+    }
+
+def _to_record_batch(name, rows, schema):
+    """
+    Convert the rows of the named table to a record batch of the given schema.
+    The host column of the image table is extracted from the URL column rather than from the rows.
+    """
+    columns = [list(column) for column in zip(*rows)]
+    if name == Image.__tablename__:
+        urls = pyarrow.array(columns[2], pyarrow.string())
+        hosts = pyarrow.compute.extract_regex(urls, URL_HOST_PATTERN).field("host")
+        columns.insert(3, hosts)
+    arrays = []
+    for field, column in zip(schema, columns):
+        if pyarrow.types.is_dictionary(field.type):
+            arrays.append(pyarrow.array(column, field.type.value_type).dictionary_encode())
+        else:
+            arrays.append(pyarrow.array(column, field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_snapshot(connection, directory, snapshot_format="parquet", batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Write the synset, image, and hyponyms tables into the directory in the given format, either 'parquet' or 'arrow'.
+    The rows are streamed from the database and each batch is written as it is converted, as a row group in Parquet files.
+    The Arrow IPC stream format is used instead of the file format, as the dictionaries are replaced by every batch.
+    The versions of the tables are stored in the metadata of each file so that a stale snapshot can be recognized.
+    Return a dictionary of the number of rows written keyed by the name of the table.
+    """
+    os.makedirs(directory, exist_ok=True)
+    metadata = {
+        "{}_version".format(table): str(version)
+        for table, version in zip(VERSIONED_TABLES, get_versions(VERSIONED_TABLES, connection))
+    }
+    schemas = get_snapshot_schemas()
+    counts = {}
+    for name, statement in _get_snapshot_statements().items():
+        schema = schemas[name].with_metadata(metadata)
+        path = os.path.join(directory, name + SNAPSHOT_FORMATS[snapshot_format])
+        if snapshot_format == "parquet":
+            writer = pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+        else:
+            writer = pyarrow.ipc.new_stream(path, schema)
+
+        counts[name] = 0
+        try:
+            result = connection.execution_options(yield_per=batch_size).execute(statement)
+            for rows in result.partitions():
+                writer.write_batch(_to_record_batch(name, rows, schema))
+                counts[name] += len(rows)
+        finally:
+            writer.close()
+    return counts
+
+@click.command("export-snapshot")
+@click.option("--directory", default=SNAPSHOT_DIR, show_default=True, help="Directory the snapshot files are written into.")
+@click.option("--format", "snapshot_format", type=click.Choice(list(SNAPSHOT_FORMATS)), default="parquet", show_default=True, help="File format of the snapshot.")
+@click.option("--batch-size", default=SNAPSHOT_BATCH_SIZE, show_default=True, help="Number of rows per record batch.")
+@with_appcontext
+def export_snapshot_command(directory, snapshot_format, batch_size):
+    """
+    Export the synset, image, and hyponyms tables into columnar files for analytics.
+    Requires pyarrow, installable with the 'analytics' extra.
+    """
+    if pyarrow is None: # pragma: no cover
+        raise click.ClickException("pyarrow is required for exporting snapshots, install it with 'pip install pyarrow'")
+
+    time_start = perf_counter()
+    with db.engine.connect() as connection:
+        counts = write_snapshot(connection, directory, snapshot_format, batch_size)
+    for name, count in counts.items():
+        click.echo("Exported {} rows of '{}'".format(count, name))
+    click.echo("Wrote the snapshot into '{}' in {:.1f} s".format(directory, perf_counter() - time_start))
@@ -1,8 +1,29 @@
 import json
-from flask import Response, request, url_for
+import re
+from functools import wraps
+from hashlib import blake2b
+from types import MappingProxyType
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from urllib.parse import quote
+from flask import Response, current_app, g, request, url_for
+from jsonschema.exceptions import best_match
 from imagenet_browser.constants import *
 from imagenet_browser.models import *
 
+try:
+    import orjson
+except ImportError: # pragma: no cover
+    orjson = None
+
+"""
+The JSON serializers that can be chosen for hypermedia responses with the JSON_SERIALIZER configuration value.
+orjson is an optional dependency that is used by default when installed as it is several times faster than the standard library.
+"""
+JSON_SERIALIZERS = {"json": json.dumps}
+if orjson is not None:
+    JSON_SERIALIZERS["orjson"] = orjson.dumps
+DEFAULT_JSON_SERIALIZER = "orjson" if orjson is not None else "json"
+
 class MasonBuilder(dict):
     """
     A convenience class for managing dictionaries that represent Mason
@@ -71,105 +92,114 @@ class MasonBuilder(dict):
 class ImagenetBrowserBuilder(MasonBuilder):
     """
     Subclass of MasonBuilder used for building hypermedia responses that use controls specific to ImageNet Browser.
+    The controls are built from templates that have every property except the href, which is the only part depending on the request.
+    The templates are built once and shared, and as such are read-only mappings, which add_control copies into a new control.
+    The schemas in the templates are the ones cached by the models and end up in the response bodies as they are, without being copied,
+    because the JSON serializers do not accept read-only mappings, so a handler that needs a different schema must build a new one.
     """
 
+    CONTROL_TEMPLATES = MappingProxyType({
+        "add_synset": MappingProxyType({
+            "method": "POST",
+            "encoding": "json",
+            "title": "Add a new synset",
+            "schema": Synset.get_schema()
+        }),
+        "edit_synset": MappingProxyType({
+            "method": "PUT",
+            "encoding": "json",
+            "title": "Edit this synset",
+            "schema": Synset.get_schema()
+        }),
+        "delete_synset": MappingProxyType({
+            "method": "DELETE",
+            "title": "Delete this synset"
+        }),
+        "add_hyponym": MappingProxyType({
+            "method": "POST",
+            "encoding": "json",
+            "title": "Add a new hyponym",
+            "schema": Synset.get_schema(wnid_only=True)
+        }),
+        "delete_hyponym": MappingProxyType({
+            "method": "DELETE",
+            "title": "Delete this hyponym"
+        }),
+        "add_image": MappingProxyType({
+            "method": "POST",
+            "encoding": "json",
+            "title": "Add a new image",
+            "schema": Image.get_schema()
+        }),
+        "edit_image": MappingProxyType({
+            "method": "PUT",
+            "encoding": "json",
+            "title": "Edit this image",
+            "schema": Image.get_schema()
+        }),
+        "delete_image": MappingProxyType({
+            "method": "DELETE",
+            "title": "Delete this image"
+        })
+    })
+
+    def add_control_from_template(self, ctrl_name, template, href):
+        """
+        Add a control built from the named control template and the href to the hypermedia response.
+        """
+        self.add_control(ctrl_name, href, **self.CONTROL_TEMPLATES[template])
+
     def add_control_add_synset(self):
         """
         Add the imagenet_browser:add_synset control for SynsetCollection to the hypermedia response.
         """
-        self.add_control(
-            "imagenet_browser:add_synset",
-            url_for("api.synsetcollection"),
-            method="POST",
-            encoding="json",
-            title="Add a new synset",
-            schema=Synset.get_schema()
-        )
+        self.add_control_from_template("imagenet_browser:add_synset", "add_synset", href_for("api.synsetcollection"))
 
     def add_control_edit_synset(self, wnid):
         """
         Add the edit control for SynsetItem to the hypermedia response.
         """
-        self.add_control(
-            "edit",
-            url_for("api.synsetitem", wnid=wnid),
-            method="PUT",
-            encoding="json",
-            title="Edit this synset",
-            schema=Synset.get_schema()
-        )
+        self.add_control_from_template("edit", "edit_synset", href_for("api.synsetitem", wnid=wnid))
 
     def add_control_delete_synset(self, wnid):
         """
         Add the imagenet_browser:delete control for SynsetItem to the hypermedia response.
         """
-        self.add_control(
-            "imagenet_browser:delete",
-            url_for("api.synsetitem", wnid=wnid),
-            method="DELETE",
-            title="Delete this synset"
-        )
+        self.add_control_from_template("imagenet_browser:delete", "delete_synset", href_for("api.synsetitem", wnid=wnid))
 
     def add_control_add_hyponym(self, wnid):
         """
         Add the imagenet_browser:add_hyponym control for SynsetHyponymCollection to the hypermedia response.
         """
-        self.add_control(
-            "imagenet_browser:add_hyponym",
-            url_for("api.synsethyponymcollection", wnid=wnid),
-            method="POST",
-            encoding="json",
-            title="Add a new hyponym",
-            schema=Synset.get_schema(wnid_only=True)
-        )
+        self.add_control_from_template("imagenet_browser:add_hyponym", "add_hyponym", href_for("api.synsethyponymcollection", wnid=wnid))
 
     def add_control_delete_hyponym(self, wnid, hyponym_wnid):
         """
         Add the imagenet_browser:delete control for SynsetHyponymItem to the hypermedia response.
         """
-        self.add_control(
+        self.add_control_from_template(
             "imagenet_browser:delete",
-            url_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=hyponym_wnid),
-            method="DELETE",
-            title="Delete this hyponym"
+            "delete_hyponym",
+            href_for("api.synsethyponymitem", wnid=wnid, hyponym_wnid=hyponym_wnid)
         )
 
     def add_control_add_image(self, wnid):
         """
         Add the imagenet_browser:add_image control for SynsetImageCollection to the hypermedia response.
         """
-        self.add_control(
-            "imagenet_browser:add_image",
-            url_for("api.synsetimagecollection", wnid=wnid),
-            method="POST",
-            encoding="json",
-            title="Add a new image",
-            schema=Image.get_schema()
-        )
+        self.add_control_from_template("imagenet_browser:add_image", "add_image", href_for("api.synsetimagecollection", wnid=wnid))
 
     def add_control_edit_image(self, wnid, imid):
         """
         Add the edit control for SynsetImageItem to the hypermedia response.
         """
-        self.add_control(
-            "edit",
-            url_for("api.synsetimageitem", wnid=wnid, imid=imid),
-            method="PUT",
-            encoding="json",
-            title="Edit this image",
-            schema=Image.get_schema()
-        )
+        self.add_control_from_template("edit", "edit_image", href_for("api.synsetimageitem", wnid=wnid, imid=imid))
 
     def add_control_delete_image(self, wnid, imid):
         """
         Add the imagenet_browser:delete control for SynsetImageItem to the hypermedia response.
         """
-        self.add_control(
-            "imagenet_browser:delete",
-            url_for("api.synsetimageitem", wnid=wnid, imid=imid),
-            method="DELETE",
-            title="Delete this image"
-        )
+        self.add_control_from_template("imagenet_browser:delete", "delete_image", href_for("api.synsetimageitem", wnid=wnid, imid=imid))
 
 def create_error_response(status_code, title, message=None):
     """
@@ -179,4 +209,189 @@ def create_error_response(status_code, title, message=None):
     body = MasonBuilder(resource_url=resource_url)
     body.add_error(title, message)
     body.add_control("profile", href=ERROR_PROFILE)
-    return Response(json.dumps(body), status_code, mimetype=MASON)
+    return Response(serialize_json(body), status_code, mimetype=MASON)
+
+def serialize_json(body):
+    """
+    Serialize a hypermedia response body to JSON using the serializer chosen by the JSON_SERIALIZER configuration value,
+    or the fastest one installed if there is no such value.
+    """
+    return JSON_SERIALIZERS[current_app.config["JSON_SERIALIZER"] or DEFAULT_JSON_SERIALIZER](body)
+
+def validate_json(instance, validator):
+    """
+    Validate the instance using a validator compiled by compile_validator.
+    Raise the same ValidationError that jsonschema.validate would, being the best match of the errors, if the instance is invalid.
+    """
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
+"""
+A variable part of a route using the default converter, and the characters that the default converter leaves unquoted in a path segment.
+"""
+ROUTE_VARIABLE = re.compile(r"<([^<>:]+)>")
+URL_PATH_SAFE = "!$&'()*+,/:;=@"
+
+def get_href_templates():
+    """
+    Return a dictionary mapping the endpoints of the current application to format strings of their paths and the names of their variables.
+    The templates are built from the URL map once, and only for the endpoints that have a single route without converters or defaults.
+    """
+    templates = current_app.extensions.get("href_templates")
+    if templates is None:
+        rules = {}
+        for rule in current_app.url_map.iter_rules():
+            rules.setdefault(rule.endpoint, []).append(rule)
+
+        templates = {}
+        for endpoint, (rule, *others) in rules.items():
+            if others or rule.defaults or re.search(r"<[^<>]*:", rule.rule):
+                continue
+            parts = ROUTE_VARIABLE.split(rule.rule)
+            template = "".join(
+                "{" + part + "}" if i % 2 else quote(part, safe=URL_PATH_SAFE)
+                for i, part in enumerate(parts)
+            )
+            templates[endpoint] = (template, frozenset(parts[1::2]))
+        current_app.extensions["href_templates"] = templates
+    return templates
+
+class HrefBuilder(object):
+    """
+    Builder of URLs that are the same as those built by url_for for the current request, but built by filling in the href templates
+    rather than going through the URL map, which is several times faster when building the hrefs of a page of items.
+    The script root and the templates are looked up once when the builder is created, so a builder is meant to be created per request.
+    """
+
+    def __init__(self):
+        self.script_root = request.script_root
+        self.templates = get_href_templates()
+
+    def __call__(self, endpoint, **values):
+        """
+        Build the URL of the endpoint.
+        Fall back to url_for for the endpoints without a template and when the values do not match the variables of the route.
+        """
+        template = self.templates.get(endpoint)
+        if template is None or template[1] != values.keys():
+            return url_for(endpoint, **values)
+        return self.script_root + template[0].format(**{
+            name: quote(str(value), safe=URL_PATH_SAFE) for name, value in values.items()
+        })
+
+def href_for(endpoint, **values):
+    """
+    Build the URL of the endpoint using a new HrefBuilder.
+    Meant for single URLs, whereas the hrefs of a page of items are built using a single HrefBuilder.
+    """
+    return HrefBuilder()(endpoint, **values)
+
+def encode_cursor(key):
+    """
+    Encode the sort key of the last item on a page into an opaque cursor for the 'after' query parameter.
+    """
+    return urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, key_types):
+    """
+    Decode a cursor created by encode_cursor and check that its sort key consists of values of the given types.
+    Raise ValueError if the cursor is malformed.
+    """
+    key = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if not isinstance(key, list) or len(key) != len(key_types):
+        raise ValueError("Cursor has an invalid sort key")
+    for value, key_type in zip(key, key_types):
+        if type(value) is not key_type:
+            raise ValueError("Cursor has an invalid sort key")
+    return key
+
+def get_page_args(*key_types):
+    """
+    Parse the query parameters controlling which page of a collection is returned.
+    The 'start' query parameter is the starting index of the page while the 'after' query parameter is a cursor,
+    created by encode_cursor, holding the sort key of the last item on the previous page.
+    The latter allows seeking to the page using an index rather than skipping over all preceding items.
+    Return the starting index and the decoded sort key, the latter being None if no cursor was given.
+    Raise ValueError with a description of the problem if either query parameter is invalid.
+    """
+    try:
+        start = int(request.args.get("start", default=0))
+    except ValueError:
+        raise ValueError("Query parameter 'start' must be an integer")
+
+    after = request.args.get("after")
+    if after is not None:
+        try:
+            after = decode_cursor(after, key_types)
+        except ValueError:
+            raise ValueError("Query parameter 'after' must be a cursor obtained from a next control")
+
+    return start, after
+
+def get_write_lock():
+    """
+    Return the lock that serializes the writes of the current application.
+    """
+    return current_app.extensions["write_lock"]
+
+def serialized_write(method):
+    """
+    Decorator for the handlers that change the database, running them one at a time under the write lock of the application.
+    Concurrent writes of a process thus queue up on the lock instead of contending for the SQLite write lock,
+    which leaves the busy timeout to order the writes of separate processes, for example the workers of a gunicorn deployment.
+    Reads do not take the lock, and in WAL mode they are not blocked by the writer either.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with get_write_lock():
+            return method(*args, **kwargs)
+    return wrapper
+
+def conditional_get(*tables):
+    """
+    Decorator for the GET handlers of resources whose representations are built from the given tables.
+    The strong entity tag of a representation is formed from the versions of the tables, along with the JSON serializer,
+    so that it changes whenever a handler changes one of the tables, and a digest of the path and the query string of the request,
+    so that the representations of different items or pages never share an entity tag.
+    If the entity tag matches the If-None-Match header of the request, 304 is returned without calling the handler,
+    otherwise the entity tag is set on a successful response of the handler.
+    Since an entity tag is only given out for a representation that exists, and deleting it changes the versions, a matching entity tag
+    also shows that the resource still exists, whereas 'If-None-Match: *' is only answered after the handler has found the resource.
+    The versions are read before calling the handler, and as such a concurrent change can at worst cause an unnecessary full response.
+    They are also kept for the rest of the request so that get_table_versions does not read them again.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(tables)
+            g.table_versions = dict(zip(tables, versions))
+            etag = "-".join(
+                [current_app.config["JSON_SERIALIZER"] or DEFAULT_JSON_SERIALIZER]
+                + [str(v) for v in versions]
+                + [blake2b(request.full_path.encode(), digest_size=8).hexdigest()]
+            )
+            if not request.if_none_match.star_tag and request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = method(*args, **kwargs)
+            if response.status_code == 200:
+                response.set_etag(etag)
+                if request.if_none_match.star_tag:
+                    response = Response(status=304)
+                    response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+def get_table_versions(tables):
+    """
+    Return the values of the version counters of the tables like get_versions,
+    reusing the versions read by conditional_get for the current request if it read them all.
+    """
+    known = g.get("table_versions", {})
+    if all(table in known for table in tables):
+        return [known[table] for table in tables]
+    return get_versions(tables)
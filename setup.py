@@ -20,5 +20,9 @@ setup(
         "requests",
         "pytest",
         "pytest-cov"
-    ]
+    ],
+    extras_require={
+        "fast": ["orjson"],
+        "analytics": ["pyarrow"]
+    }
 )
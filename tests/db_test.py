@@ -1,11 +1,15 @@
 import os
+import random
 import pytest
 import tempfile
+from jsonschema import validate, ValidationError
 from sqlalchemy.engine import Engine
-from sqlalchemy import event
+from sqlalchemy import event, text
 from sqlalchemy.exc import IntegrityError, StatementError
 from imagenet_browser import create_app, db
-from imagenet_browser.models import Synset, Image
+from imagenet_browser.hierarchy import HierarchySnapshot
+from imagenet_browser.utils import validate_json, get_write_lock, serialized_write
+from imagenet_browser.models import Synset, Image, Counter, hyponyms, synset_closure, update_row_counts, rebuild_row_counts, rebuild_synset_closure, add_synset_closure, remove_synset_closure, search_synsets
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
@@ -174,3 +178,289 @@ def test_synset_onupdate_synset(app):
 
         db_synset = Synset.query.filter_by(wnid="n02103406").first()
         assert db_synset_hyponym in db_synset.hyponyms
+
+def test_schemas(app):
+    """
+    Tests that the schemas of the models are built once and then shared between calls.
+    """
+    assert Synset.get_schema() is Synset.get_schema()
+    assert Synset.get_schema(wnid_only=True) is Synset.get_schema(wnid_only=True)
+    assert Synset.get_schema(wnid_only=True)["required"] == ["wnid"]
+    assert Synset.get_schema()["required"] == ["wnid", "words", "gloss"]
+    assert Image.get_schema() is Image.get_schema()
+
+def test_validators(app):
+    """
+    Tests that the compiled validators of the models reject the same documents with the same messages as jsonschema.validate.
+    """
+    documents = [
+        {"wnid": "n02121620", "words": "cat", "gloss": "feline mammal"},
+        {"wnid": "n0212162", "words": "cat", "gloss": "feline mammal"},
+        {"wnid": "n02121620", "words": 1},
+        {"imid": 1, "url": "http://example.com/cat.jpg", "date": "2011-01-01"},
+        {"imid": "1", "url": "ftp://example.com/cat.jpg", "date": "2011-13-01"},
+        [],
+        {}
+    ]
+    validators = [
+        (Synset.get_schema(), Synset.get_validator()),
+        (Synset.get_schema(wnid_only=True), Synset.get_validator(wnid_only=True)),
+        (Image.get_schema(), Image.get_validator())
+    ]
+    for schema, validator in validators:
+        for document in documents:
+            try:
+                validate(document, schema)
+                expected = None
+            except ValidationError as e:
+                expected = str(e)
+            try:
+                validate_json(document, validator)
+                actual = None
+            except ValidationError as e:
+                actual = str(e)
+            assert actual == expected
+
+def test_counters(app):
+    """
+    Database test that checks that the synset and image counters are recomputed from the row counts and updated by deltas,
+    and that inserting and deleting rows alone, as bulk loads do, does not touch them.
+    Due to the 'app' parameter, this function will obtain a new application, and as such also a new database, from the application factory.
+    """
+
+    with app.app_context():
+        assert Counter.get_value("synset") == 0
+        assert Counter.get_value("image") == 0
+
+        synset = _get_synset()
+        db.session.add(_get_image(synset=synset))
+        db.session.add(_get_image(imid=11, synset=synset))
+        db.session.commit()
+        assert Counter.get_value("synset") == 0
+        assert Counter.get_value("image") == 0
+
+        rebuild_row_counts(db.session)
+        db.session.commit()
+        assert Counter.get_value("synset") == 1
+        assert Counter.get_value("image") == 2
+
+        db.session.delete(Synset.query.filter_by(wnid="n02103406").first())
+        update_row_counts(db.session, {"synset": -1, "image": -2})
+        db.session.commit()
+        assert Counter.get_value("synset") == 0
+        assert Counter.get_value("image") == 0
+
+def _get_closure():
+    """
+    Return the rows of the closure table as a set of tuples.
+    """
+    return set(tuple(row) for row in db.session.execute(db.select(synset_closure)))
+
+def test_synset_closure(app):
+    """
+    Database test that builds a random is-a hierarchy where synsets can have multiple parents,
+    and checks that the incrementally maintained closure table matches the one rebuilt from scratch
+    after every added and removed hyponym, and that removing a hyponym takes a constant number of statements.
+    Due to the 'app' parameter, this function will obtain a new application, and as such also a new database, from the application factory.
+    """
+
+    rng = random.Random(0)
+    wnids = ["n0000{:04d}".format(i) for i in range(30)]
+    edges = [(wnids[i], wnids[j]) for j in range(1, 30) for i in rng.sample(range(j), min(j, rng.randint(1, 3)))]
+
+    with app.app_context():
+        for wnid in wnids:
+            db.session.add(_get_synset(wnid=wnid))
+        db.session.commit()
+
+        for wnid, hyponym_wnid in edges:
+            db.session.execute(hyponyms.insert().values(synset_wnid=wnid, synset_hyponym_wnid=hyponym_wnid))
+            add_synset_closure(wnid, hyponym_wnid)
+            incremental = _get_closure()
+            rebuild_synset_closure(db.session)
+            assert incremental == _get_closure()
+
+        for wnid, hyponym_wnid in rng.sample(edges, 20):
+            db.session.execute(hyponyms.delete().where(
+                hyponyms.c.synset_wnid == wnid,
+                hyponyms.c.synset_hyponym_wnid == hyponym_wnid
+            ))
+            statements = []
+            count_statement = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", count_statement)
+            remove_synset_closure(wnid, hyponym_wnid)
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+            assert len(statements) == 2
+            incremental = _get_closure()
+            rebuild_synset_closure(db.session)
+            assert incremental == _get_closure()
+
+def test_hierarchy_snapshot(app):
+    """
+    Database test that builds the hierarchy snapshot of a random is-a hierarchy where synsets can have multiple parents.
+    Checks that each path to the root follows hyponyms, and that its length matches the shortest depth found in the closure table.
+    Checks that the lowest common ancestor of two synsets is a common ancestor with the shortest combined distance according to the closure table.
+    Checks that a WordNet ID with non-ASCII digits is not taken for the synset with the same digits in ASCII.
+    Due to the 'app' parameter, this function will obtain a new application, and as such also a new database, from the application factory.
+    """
+
+    rng = random.Random(1)
+    wnids = ["n0000{:04d}".format(i) for i in range(40)]
+    edges = set((wnids[i], wnids[j]) for j in range(3, 40) for i in rng.sample(range(j), rng.randint(1, 2)))
+
+    with app.app_context():
+        for wnid in wnids:
+            db.session.add(_get_synset(wnid=wnid))
+        db.session.commit()
+        for wnid, hyponym_wnid in edges:
+            db.session.execute(hyponyms.insert().values(synset_wnid=wnid, synset_hyponym_wnid=hyponym_wnid))
+        rebuild_synset_closure(db.session)
+
+        snapshot = HierarchySnapshot.from_database()
+        closure = {(ancestor, descendant): depth for ancestor, descendant, depth in _get_closure()}
+        roots = set(wnids) - set(hyponym_wnid for _, hyponym_wnid in edges)
+        assert snapshot.nbytes() < 1024
+
+        for wnid in wnids:
+            path = snapshot.path_to_root(wnid)
+            assert path[-1] in roots
+            assert all((parent, child) in edges for child, parent in zip(path, path[1:]))
+            depths = [closure[(root, wnid)] for root in roots if (root, wnid) in closure]
+            assert snapshot.depth(wnid) == min(depths, default=0)
+
+        for wnid, other_wnid in zip(rng.sample(wnids, 20), rng.sample(wnids, 20)):
+            def distances(x):
+                found = {ancestor: depth for (ancestor, descendant), depth in closure.items() if descendant == x}
+                found[x] = 0
+                return found
+            ancestors, other_ancestors = distances(wnid), distances(other_wnid)
+            common = set(ancestors) & set(other_ancestors)
+            lca_wnid = snapshot.lowest_common_ancestor(wnid, other_wnid)
+            if not common:
+                assert lca_wnid is None
+            else:
+                assert ancestors[lca_wnid] + other_ancestors[lca_wnid] == min(ancestors[c] + other_ancestors[c] for c in common)
+
+        assert "n00009999" not in snapshot
+        with pytest.raises(KeyError):
+            snapshot.path_to_root("n00009999")
+        assert "n\u0660\u0660\u0660\u0660\u0660\u0660\u0660\u0663" not in snapshot
+        with pytest.raises(ValueError):
+            snapshot.path_to_root("n\u0660\u0660\u0660\u0660\u0660\u0660\u0660\u0663")
+
+def test_sqlite_profile():
+    """
+    Database test that creates an application using the concurrent SQLite connection profile with an extra pragma overriding one of the profile.
+    Checks that new connections are in WAL mode with the pragmas of the profile, that load-db keeps the database in WAL mode,
+    and that handlers decorated to serialize writes run under the write lock of the application.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(directory, "test.db"),
+            "TESTING": True,
+            "SQLITE_PROFILE": "concurrent",
+            "SQLITE_PRAGMAS": {"cache_size": -1024}
+        })
+        with app.app_context():
+            db.create_all()
+            assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert db.session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+            assert db.session.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert db.session.execute(text("PRAGMA cache_size")).scalar() == -1024
+            db.session.remove()
+
+        _write_load_files(directory)
+        result = app.test_cli_runner().invoke(args=["load-db", "--directory", directory])
+        assert result.exit_code == 0
+
+        with app.app_context():
+            assert Image.query.count() == 3
+            assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+
+            @serialized_write
+            def write():
+                return get_write_lock().locked()
+
+            assert write()
+            assert not get_write_lock().locked()
+            db.session.remove()
+        with app.app_context():
+            db.engine.dispose()
+
+def _write_load_files(directory):
+    """
+    Write a minimal set of ImageNet files, in the format used by the load-db command, to the directory.
+    """
+    files = {
+        "words.txt": "n02103406\tworking dog\nn02109047\tGreat Dane\nn02109391\thearing dog\n",
+        "gloss.txt": "n02103406\tdogs bred to work\nn02109047\tvery large dog\nn02109391\tdog trained to assist the deaf\n",
+        "fall11_urls.txt": "n02103406_9\thttp://farm3.static.flickr.com/2056/2203156496_bf1b977326.jpg\n"
+                           "n02103406_282\thttp://farm3.static.flickr.com/2250/2144303881_9ed6f44542.jpg\n"
+                           "n02109047_11\thttp://farm1.static.flickr.com/123/403783566_7a838f13c2.jpg\n",
+        "wordnet.is_a.txt": "n02103406 n02109047\nn02103406 n02109391\nn02103406 n00000000\nn02103406 n02109047\n"
+    }
+    for name, content in files.items():
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(content)
+
+def test_load_db(app):
+    """
+    Database test that loads the ImageNet files using the load-db command with a batch size smaller than the number of rows.
+    Checks that all synsets, images, and valid hyponyms are present and that the tuned pragmas are restored afterwards.
+    Hyponym lines with unknown WordNet IDs and duplicate hyponym lines are skipped.
+    Due to the 'app' parameter, this function will obtain a new application, and as such also a new database, from the application factory.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_load_files(directory)
+        result = app.test_cli_runner().invoke(args=["load-db", "--directory", directory, "--batch-size", "2"])
+        assert result.exit_code == 0
+        assert "rows/s" in result.output
+        assert "Skipped 2 invalid or duplicate hyponym lines" in result.output
+        assert "Built 2 rows into 'synset_closure'" in result.output
+
+    with app.app_context():
+        assert Synset.query.count() == 3
+        assert Image.query.count() == 3
+        db_synset = Synset.query.filter_by(wnid="n02103406").first()
+        assert [synset.wnid for synset in db_synset.hyponyms] == ["n02109047", "n02109391"]
+        assert len(db_synset.images) == 2
+        assert Counter.get_value("image") == 3
+        assert (db_synset.image_count, db_synset.subtree_image_count) == (2, 3)
+        assert [synset.wnid for synset in search_synsets("deaf", 0, 10)] == ["n02109391"]
+        assert db.session.execute(text("PRAGMA synchronous")).scalar() == 2
+
+def test_export_snapshot(app):
+    """
+    Database test that exports the loaded ImageNet files using the export-snapshot command in both formats with a batch size smaller than the number of rows.
+    Checks that the rows of all tables are present, that the WordNet IDs and URL hosts are dictionary encoded, and that the table versions are stored.
+    Skipped if pyarrow is not installed.
+    Due to the 'app' parameter, this function will obtain a new application, and as such also a new database, from the application factory.
+    """
+
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_load_files(directory)
+        app.test_cli_runner().invoke(args=["load-db", "--directory", directory])
+
+        result = app.test_cli_runner().invoke(args=["export-snapshot", "--directory", directory, "--batch-size", "2"])
+        assert result.exit_code == 0
+        assert "Exported 3 rows of 'image'" in result.output
+        image = pyarrow.parquet.read_table(os.path.join(directory, "image.parquet"))
+        assert image.column("synset_wnid").to_pylist() == ["n02103406", "n02103406", "n02109047"]
+        assert image.column("imid").to_pylist() == [9, 282, 11]
+        assert set(image.column("url_host").to_pylist()) == {"farm3.static.flickr.com", "farm1.static.flickr.com"}
+        assert pyarrow.types.is_dictionary(image.schema.field("url_host").type)
+        assert image.schema.metadata[b"image_version"] == b"1"
+        assert pyarrow.parquet.read_table(os.path.join(directory, "synset.parquet")).num_rows == 3
+
+        result = app.test_cli_runner().invoke(args=["export-snapshot", "--directory", directory, "--format", "arrow", "--batch-size", "2"])
+        assert result.exit_code == 0
+        with pyarrow.ipc.open_stream(os.path.join(directory, "hyponyms.arrows")) as reader:
+            hyponyms_table = reader.read_all()
+        assert hyponyms_table.column("synset_hyponym_wnid").to_pylist() == ["n02109047", "n02109391"]
+        assert pyarrow.types.is_dictionary(hyponyms_table.schema.field("synset_wnid").type)
@@ -3,11 +3,15 @@ import pytest
 import tempfile
 import json
 from jsonschema import validate
+from flask import url_for
 from sqlalchemy.engine import Engine
 from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError, StatementError
 from imagenet_browser import create_app, db
-from imagenet_browser.models import Synset, Image
+from imagenet_browser.cache import ResponseCache
+from imagenet_browser.profiling import ProfilerMiddleware
+from imagenet_browser.utils import ImagenetBrowserBuilder, get_href_templates, href_for
+from imagenet_browser.models import Synset, Image, rebuild_synset_closure, rebuild_image_counts, rebuild_row_counts, rebuild_synset_search
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
@@ -54,6 +58,7 @@ def _populate_db():
     Populate the initial database.
     All relationships possible using the database models are present in this initial database.
     Synsets have a one-to-many relationship with images and many-to-many relationship with themselves.
+    The closure table is built from the hyponyms, the image counts of the synsets and the row counters are computed, and the full-text search index is built.
     """
     synset = Synset(wnid="n02103406", words="working dog", gloss="any of several breeds of usually large powerful dogs bred to work as draft animals and guard and guide dogs")
     synset_image_one = Image(imid=9, url="http://farm3.static.flickr.com/2056/2203156496_bf1b977326.jpg", date=None, synset=synset)
@@ -67,6 +72,52 @@ def _populate_db():
     db.session.add(synset_hyponym_image)
     db.session.add(synset_hyponym_to_be)
     db.session.commit()
+    rebuild_synset_closure(db.session)
+    rebuild_image_counts(db.session)
+    rebuild_row_counts(db.session)
+    rebuild_synset_search(db.session)
+    db.session.commit()
+
+def _populate_db_images(client, count, wnid="n02103406"):
+    """
+    Add the given number of images to the synset in the initial database so that its collections span multiple pages.
+    """
+    with client.application.app_context():
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        for imid in range(1000, 1000 + count):
+            db.session.add(Image(imid=imid, url="http://static.flickr.com/{}.jpg".format(imid), date=None, synset=synset))
+        db.session.commit()
+        rebuild_image_counts(db.session)
+        rebuild_row_counts(db.session)
+        db.session.commit()
+
+def _populate_db_hyponyms(client, count, wnid="n02103406"):
+    """
+    Add the given number of synsets as hyponyms of the synset in the initial database so that its hyponyms span multiple pages.
+    """
+    with client.application.app_context():
+        synset = Synset.query.filter_by(wnid=wnid).first()
+        for i in range(count):
+            synset.hyponyms.append(Synset(wnid="n0300{:04d}".format(i), words="hyponym {}".format(i), gloss="a hyponym"))
+        db.session.commit()
+        rebuild_synset_closure(db.session)
+        rebuild_image_counts(db.session)
+        rebuild_row_counts(db.session)
+        db.session.commit()
+
+def _walk_pages(client, href):
+    """
+    Follow the next controls of a collection starting from the given URL.
+    Return the items of all pages in the order they were received.
+    """
+    items = []
+    while href:
+        resp = client.get(href)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        items.extend(body["items"])
+        href = body["@controls"].get("next", {}).get("href")
+    return items
 
 def _get_synset_json(hyponym_to_be=False):
     """
@@ -179,6 +230,33 @@ class TestEntryPoint(object):
         assert resp.status_code == 200
 
 
+class TestHrefFor(object):
+    """
+    This class contains the tests for the href templates that the hypermedia responses of all handlers build their URLs from.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    def test_href_for(self, client):
+        """
+        Assert that the URLs built from the href templates match those built by url_for for every API endpoint,
+        including values that need quoting and applications mounted below the root.
+        Assert that endpoints given values that do not match their routes fall back to url_for.
+        """
+
+        values = ["n02103406", 9, "a b/c?d#e%f", "café", "{wnid}", "!$&'()*+,;=@:"]
+        for script_root in ["", "/browser"]:
+            with client.application.test_request_context(base_url="http://localhost" + script_root):
+                templates = get_href_templates()
+                endpoints = [endpoint for endpoint in templates if endpoint.startswith("api.")]
+                assert "api.synsetimageitem" in endpoints
+                for endpoint in endpoints:
+                    for value in values:
+                        kwargs = {name: value for name in templates[endpoint][1]}
+                        assert href_for(endpoint, **kwargs) == url_for(endpoint, **kwargs)
+                assert href_for("api.synsetcollection", start=50) == url_for("api.synsetcollection", start=50)
+
+
 class TestSynsetCollection(object):
     """
     This class contains the resource tests for the SynsetCollection resource.
@@ -240,8 +318,135 @@ class TestSynsetCollection(object):
         del valid["wnid"]
         resp = client.post(self.RESOURCE_URL, json=valid)
         assert resp.status_code == 400
-        
-        
+
+    def test_search(self, client):
+        """
+        Assert that a GET sent to the resource URL with a search query succeeds.
+        Assert that the synsets matching the query are ranked with matches in the words before matches in the gloss.
+        Assert that synsets added, edited, and deleted through the API are reflected in the search results.
+        Assert that a search query using the FTS5 query syntax is treated as plain terms.
+        Assert that a GET sent to the resource URL fails when using an empty search query.
+        """
+
+        resp = client.get(self.RESOURCE_URL + "?q=dog")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        wnids = [item["wnid"] for item in body["items"]]
+        assert sorted(wnids[:2]) == ["n02103406", "n02109391"]
+        assert wnids[2] == "n02109047"
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+
+        body = json.loads(client.get(self.RESOURCE_URL + "?q=assist+deaf").data)
+        assert [item["wnid"] for item in body["items"]] == ["n02109391"]
+
+        valid = _get_synset_json()
+        resp = client.post(self.RESOURCE_URL, json=valid)
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL + "?q=feline").data)
+        assert [item["wnid"] for item in body["items"]] == [valid["wnid"]]
+
+        valid["gloss"] = "a small domesticated carnivore"
+        resp = client.put(self.RESOURCE_URL + valid["wnid"] + "/", json=valid)
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL + "?q=feline").data)
+        assert body["items"] == []
+        body = json.loads(client.get(self.RESOURCE_URL + "?q=carnivore").data)
+        assert [item["wnid"] for item in body["items"]] == [valid["wnid"]]
+
+        resp = client.delete(self.RESOURCE_URL + valid["wnid"] + "/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL + "?q=carnivore").data)
+        assert body["items"] == []
+
+        resp = client.get(self.RESOURCE_URL + '?q=dog"+OR+NEAR(')
+        assert resp.status_code == 200
+
+        resp = client.get(self.RESOURCE_URL + "?q=+")
+        assert resp.status_code == 400
+
+class TestSynsetAutocomplete(object):
+    """
+    This class contains the resource tests for the SynsetAutocomplete resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/autocomplete/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL with a prefix succeeds.
+        Check that the namespace and the GET-using controls are valid.
+        Assert that the word phrases starting with the prefix are listed in alphabetical order regardless of case.
+        Assert that synsets added, edited, and deleted through the API are reflected in the completions.
+        Assert that a GET sent to the resource URL fails when using an empty prefix.
+        """
+
+        resp = client.get(self.RESOURCE_URL + "?prefix=dog")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert body["items"] == []
+
+        resp = client.get(self.RESOURCE_URL + "?prefix=GREAT")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        _check_control_get_method("self", client, body)
+        _check_control_get_method("collection", client, body)
+        assert [(item["phrase"], item["wnids"]) for item in body["items"]] == [("Great Dane", ["n02109047"])]
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+            _check_control_get_method("profile", client, item)
+
+        valid = _get_synset_json()
+        resp = client.post("/api/synsets/", json=valid)
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=true").data)
+        assert [(item["phrase"], item["wnids"]) for item in body["items"]] == [("true cat", [valid["wnid"]])]
+
+        valid["words"] = "hearing cat, true cat"
+        resp = client.put("/api/synsets/" + valid["wnid"] + "/", json=valid)
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=cat").data)
+        assert body["items"] == []
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=hearing").data)
+        assert [item["phrase"] for item in body["items"]] == ["hearing cat", "hearing dog"]
+
+        resp = client.delete("/api/synsets/" + valid["wnid"] + "/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=hearing").data)
+        assert [(item["phrase"], item["wnids"]) for item in body["items"]] == [("hearing dog", ["n02109391"])]
+
+        resp = client.get(self.RESOURCE_URL + "?prefix=+")
+        assert resp.status_code == 400
+
+    def test_get_other_process(self, client):
+        """
+        Assert that a synset added through the same application patches the word index rather than rebuilding it,
+        while a synset added through another application using the same database, as the other workers of a deployment would,
+        is reflected in the completions once the index has been rebuilt.
+        """
+
+        other_client = create_app(client.application.config).test_client()
+        client.get(self.RESOURCE_URL + "?prefix=true")
+        index = client.application.extensions["word_index"][0]
+
+        valid = _get_synset_json()
+        resp = client.post("/api/synsets/", json=valid)
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=true").data)
+        assert [item["phrase"] for item in body["items"]] == ["true cat"]
+        assert client.application.extensions["word_index"][0] is index
+
+        valid["wnid"] = "n02121808"
+        valid["words"] = "true cat, domestic cat"
+        resp = other_client.post("/api/synsets/", json=valid)
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL + "?prefix=true").data)
+        assert [item["wnids"] for item in body["items"]] == [["n02121620", "n02121808"]]
+
+
 class TestSynsetItem(object):
     """
     This class contains the resource tests for the SynsetItem resource.
@@ -278,6 +483,53 @@ class TestSynsetItem(object):
         resp = client.get(self.INVALID_URL)
         assert resp.status_code == 404
 
+    def test_get_conditional(self, client):
+        """
+        Assert that a GET sent to the resource URL has a strong entity tag.
+        Assert that a GET sent to the resource URL with a matching If-None-Match header succeeds with no body.
+        Assert that adding an image to the synset and removing one of its hyponyms each change the entity tag,
+        while adding an image leaves the entity tag of the synset collection unchanged.
+        Assert that a GET sent to the invalid URL has no entity tag and is not found even with a matching If-None-Match header,
+        which also holds for the entity tag of another synset.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        etag = resp.headers["ETag"]
+        assert etag.startswith('"')
+        collection_etag = client.get("/api/synsets/").headers["ETag"]
+
+        resp = client.get(self.RESOURCE_URL, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.data == b""
+        assert resp.headers["ETag"] == etag
+
+        resp = client.post(self.RESOURCE_URL + "images/", json=_get_image_json())
+        assert resp.status_code == 201
+        resp = client.get(self.RESOURCE_URL, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert json.loads(resp.data)["image_count"] == 3
+        assert resp.headers["ETag"] != etag
+        etag = resp.headers["ETag"]
+        resp = client.get("/api/synsets/", headers={"If-None-Match": collection_etag})
+        assert resp.status_code == 304
+
+        resp = client.delete(self.RESOURCE_URL + "hyponyms/n02109047/")
+        assert resp.status_code == 204
+        resp = client.get(self.RESOURCE_URL, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        etag = resp.headers["ETag"]
+
+        resp = client.get(self.INVALID_URL)
+        assert "ETag" not in resp.headers
+        resp = client.get(self.INVALID_URL, headers={"If-None-Match": "*"})
+        assert resp.status_code == 404
+        resp = client.get(self.INVALID_URL, headers={"If-None-Match": etag})
+        assert resp.status_code == 404
+        resp = client.get(self.RESOURCE_URL, headers={"If-None-Match": "*"})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+
     def test_put(self, client):
         """
         Assert that a PUT sent to the resource URL fails when using an invalid Content-Type in the request headers.
@@ -310,12 +562,15 @@ class TestSynsetItem(object):
     def test_delete(self, client):
         """
         Assert that a DELETE sent to the resource URL succeeds.
+        Assert that the synset and its images are no longer counted in the totals of the synset and image collections.
         Assert that a DELETE sent to the resource URL fails when the resource was already deleted.
         Assert that a DELETE sent to the invalid URL fails.
         """
 
         resp = client.delete(self.RESOURCE_URL)
         assert resp.status_code == 204
+        assert json.loads(client.get("/api/synsets/").data)["total"] == 2
+        assert json.loads(client.get("/api/images/").data)["total"] == 1
 
         resp = client.delete(self.RESOURCE_URL)
         assert resp.status_code == 404
@@ -399,6 +654,27 @@ class TestSynsetHyponymCollection(object):
 
         resp = client.post(self.INVALID_URL, json=valid)
         assert resp.status_code == 404
+
+    def test_get_pages(self, client):
+        """
+        Add enough hyponyms for the collection to span multiple pages.
+        Assert that following the cursor-using next controls returns every hyponym exactly once and in order.
+        Assert that a GET sent to the resource URL succeeds when using the starting index, and that it has a prev control.
+        """
+
+        _populate_db_hyponyms(client, 70)
+
+        items = _walk_pages(client, self.RESOURCE_URL)
+        wnids = [item["wnid"] for item in items]
+        assert wnids == sorted(wnids)
+        assert len(wnids) == 71
+
+        resp = client.get(self.RESOURCE_URL + "?start=50")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["wnid"] for item in body["items"]] == wnids[50:]
+        assert "prev" in body["@controls"]
+        assert "next" not in body["@controls"]
         
         
 class TestSynsetHyponymItem(object):
@@ -457,6 +733,200 @@ class TestSynsetHyponymItem(object):
         assert resp.status_code == 404
 
 
+class TestSynsetDescendantCollection(object):
+    """
+    This class contains the resource tests for the SynsetDescendantCollection resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02103406/descendants/"
+    INVALID_URL = "/api/synsets/n00000000/descendants/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL succeeds.
+        Check that the response body is deserializable JSON.
+        Check that the namespace is valid.
+        Assert that the items in the collection reflect those added in the initial database population.
+        Check that the GET-using controls are valid for each item in the collection.
+        Assert that a descendant added through a hyponym of a hyponym appears with the appropriate depth.
+        Assert that removing the hyponym in between also removes the indirect descendant.
+        Assert that a GET sent to the resource URL fails when using an invalid query parameter.
+        Assert that a GET sent to the invalid URL fails.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        assert [(item["wnid"], item["depth"]) for item in body["items"]] == [("n02109047", 1)]
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+            _check_control_get_method("profile", client, item)
+
+        resp = client.post("/api/synsets/n02109047/hyponyms/", json=_get_synset_json(hyponym_to_be=True))
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert [(item["wnid"], item["depth"]) for item in body["items"]] == [("n02109047", 1), ("n02109391", 2)]
+
+        resp = client.delete("/api/synsets/n02103406/hyponyms/n02109047/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert body["items"] == []
+
+        resp = client.get(self.RESOURCE_URL + "?start=first")
+        assert resp.status_code == 400
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+
+
+class TestSynsetAncestorCollection(object):
+    """
+    This class contains the resource tests for the SynsetAncestorCollection resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02109391/ancestors/"
+    INVALID_URL = "/api/synsets/n00000000/ancestors/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL succeeds and that the synset has no ancestors in the initial database.
+        Assert that the ancestors of a hyponym of a hyponym appear with the appropriate depths.
+        Check that the GET-using controls are valid for each item in the collection.
+        Assert that a POST making an ancestor a hyponym fails, as the hierarchy would then have a cycle.
+        Assert that deleting the synset in between also removes the indirect ancestor.
+        Assert that a GET sent to the invalid URL fails.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert json.loads(resp.data)["items"] == []
+
+        resp = client.post("/api/synsets/n02109047/hyponyms/", json=_get_synset_json(hyponym_to_be=True))
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        _check_namespace(client, body)
+        assert [(item["wnid"], item["depth"]) for item in body["items"]] == [("n02103406", 2), ("n02109047", 1)]
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+
+        resp = client.post("/api/synsets/n02109391/hyponyms/", json={"wnid": "n02103406"})
+        assert resp.status_code == 409
+        resp = client.post("/api/synsets/n02109391/hyponyms/", json={"wnid": "n02109391"})
+        assert resp.status_code == 409
+
+        resp = client.delete("/api/synsets/n02109047/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert body["items"] == []
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+
+
+class TestSynsetPath(object):
+    """
+    This class contains the resource tests for the SynsetPath resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02109391/path/"
+    INVALID_URL = "/api/synsets/n00000000/path/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL succeeds and that the synset is its own root in the initial database.
+        Assert that the path and depth reflect a hyponym added to a hyponym.
+        Check that the namespace and the GET-using controls are valid for each item in the path.
+        Assert that the path reflects the removal of the hyponym in between.
+        Assert that a GET sent to the invalid URL, or to the URL of the synset written with non-ASCII digits, fails.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert body["depth"] == 0
+        assert [item["wnid"] for item in body["items"]] == ["n02109391"]
+
+        resp = client.post("/api/synsets/n02109047/hyponyms/", json=_get_synset_json(hyponym_to_be=True))
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        _check_namespace(client, body)
+        assert body["depth"] == 2
+        assert [item["wnid"] for item in body["items"]] == ["n02109391", "n02109047", "n02103406"]
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+
+        resp = client.delete("/api/synsets/n02103406/hyponyms/n02109047/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert [item["wnid"] for item in body["items"]] == ["n02109391", "n02109047"]
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+        resp = client.get("/api/synsets/n\u0660\u0662\u0661\u0660\u0669\u0663\u0669\u0661/path/")
+        assert resp.status_code == 404
+
+    def test_get_other_process(self, client):
+        """
+        Assert that the path reflects a hyponym added through another application using the same database,
+        as the other workers of a deployment would, once the path has already been built from the hierarchy snapshot.
+        """
+
+        other_client = create_app(client.application.config).test_client()
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert [item["wnid"] for item in body["items"]] == ["n02109391"]
+
+        resp = other_client.post("/api/synsets/n02109047/hyponyms/", json=_get_synset_json(hyponym_to_be=True))
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert [item["wnid"] for item in body["items"]] == ["n02109391", "n02109047", "n02103406"]
+
+
+class TestSynsetLowestCommonAncestor(object):
+    """
+    This class contains the resource tests for the SynsetLowestCommonAncestor resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02109047/lca/n02109391/"
+    INVALID_URL = "/api/synsets/n02109047/lca/n00000000/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL fails while the synsets have no common ancestor.
+        Assert that a GET sent to the resource URL succeeds once both synsets are hyponyms of the same synset.
+        Check that the namespace and the GET-using control are valid.
+        Assert that a synset is the lowest common ancestor of itself and its hyponym.
+        Assert that a GET sent to the invalid URL fails.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 404
+
+        resp = client.post("/api/synsets/n02103406/hyponyms/", json=_get_synset_json(hyponym_to_be=True))
+        assert resp.status_code == 201
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        _check_control_get_method("imagenet_browser:synsetitem", client, body)
+        assert body["lca_wnid"] == "n02103406"
+
+        body = json.loads(client.get("/api/synsets/n02103406/lca/n02109047/").data)
+        assert body["lca_wnid"] == "n02103406"
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+
+
 class TestSynsetImageCollection(object):
     """
     This class contains the resource tests for the SynsetImageCollection resource.
@@ -475,6 +945,7 @@ class TestSynsetImageCollection(object):
         Assert that the number of items in the collection reflects those added in the initial database population.
         Check that the GET-using controls are valid for each item in the collection.
         Assert that a GET sent to the resource URL fails when using an invalid query parameter.
+        Assert that a GET sent to the resource URL with a cursor succeeds, but fails when the cursor is of another synset.
         Assert that a GET sent to the invalid URL fails.
         """
 
@@ -492,6 +963,13 @@ class TestSynsetImageCollection(object):
         resp = client.get(self.RESOURCE_URL + "?start=first")
         assert resp.status_code == 400
 
+        # cursors of ["n02103406", 9] and ["n02109047", 9]
+        resp = client.get(self.RESOURCE_URL + "?after=WyJuMDIxMDM0MDYiLDld")
+        assert resp.status_code == 200
+        assert [item["imid"] for item in json.loads(resp.data)["items"]] == [282]
+        resp = client.get(self.RESOURCE_URL + "?after=WyJuMDIxMDkwNDciLDld")
+        assert resp.status_code == 400
+
         resp = client.get(self.INVALID_URL)
         assert resp.status_code == 404
 
@@ -529,6 +1007,32 @@ class TestSynsetImageCollection(object):
         assert resp.status_code == 404
         
         
+    def test_get_pages(self, client):
+        """
+        Add enough images for the collection to span multiple pages.
+        Assert that following the cursor-using next controls returns every image exactly once and in order.
+        Assert that a GET sent to the resource URL succeeds when using the starting index, and that it has a prev control.
+        Assert that a GET sent to the resource URL fails when using an invalid cursor.
+        """
+
+        _populate_db_images(client, 120)
+
+        items = _walk_pages(client, self.RESOURCE_URL)
+        imids = [item["imid"] for item in items]
+        assert imids == sorted(imids)
+        assert len(imids) == 122
+
+        resp = client.get(self.RESOURCE_URL + "?start=50")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["imid"] for item in body["items"]] == imids[50:100]
+        assert "prev" in body["@controls"]
+        assert "next" in body["@controls"]
+
+        resp = client.get(self.RESOURCE_URL + "?after=notacursor")
+        assert resp.status_code == 400
+
+
 class TestSynsetImageItem(object):
     """
     This class contains the resource tests for the SynsetImageItem resource.
@@ -572,6 +1076,7 @@ class TestSynsetImageItem(object):
         Assert that a PUT sent to the resource URL fails when using a clashing image ID in the request body.
         Assert that a PUT sent to the resource URL succeeds when using valid JSON in the request body.
         Assert that a PUT sent to the resource URL fails when there is no image ID in the request body.
+        Assert that a PUT sent to the resource URL fails when using a date that does not exist in the request body.
         """
 
         valid = _get_image_json()
@@ -593,6 +1098,11 @@ class TestSynsetImageItem(object):
         del valid["imid"]
         resp = client.put(self.RESOURCE_URL, json=valid)
         assert resp.status_code == 400
+
+        valid["imid"] = 9
+        valid["date"] = "2011-02-30"
+        resp = client.put(self.RESOURCE_URL, json=valid)
+        assert resp.status_code == 400
         
     def test_delete(self, client):
         """
@@ -611,6 +1121,227 @@ class TestSynsetImageItem(object):
         assert resp.status_code == 404
 
 
+class TestSynsetSubtreeImageCollection(object):
+    """
+    This class contains the resource tests for the SynsetSubtreeImageCollection resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02103406/subtree-images/"
+    INVALID_URL = "/api/synsets/n00000000/subtree-images/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL succeeds.
+        Check that the response body is deserializable JSON.
+        Check that the namespace is valid.
+        Assert that the items in the collection are the images of the synset and its hyponym, and that the total reflects them.
+        Check that the GET-using controls are valid for each item in the collection.
+        Assert that adding and deleting an image of the hyponym, as well as removing the hyponym, are reflected in the
+        collection and in the image counts of the synset item.
+        Assert that a GET sent to the resource URL fails when using an invalid query parameter.
+        Assert that a GET sent to the invalid URL fails.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        assert [(item["synset_wnid"], item["imid"]) for item in body["items"]] == [("n02103406", 9), ("n02103406", 282), ("n02109047", 11)]
+        assert body["total"] == 3
+        for item in body["items"]:
+            _check_control_get_method("self", client, item)
+            _check_control_get_method("profile", client, item)
+
+        resp = client.post("/api/synsets/n02109047/images/", json=_get_image_json())
+        assert resp.status_code == 201
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert len(body["items"]) == 4
+        assert body["total"] == 4
+        body = json.loads(client.get("/api/synsets/n02103406/").data)
+        assert (body["image_count"], body["subtree_image_count"]) == (2, 4)
+
+        resp = client.delete("/api/synsets/n02109047/images/11/")
+        assert resp.status_code == 204
+        body = json.loads(client.get("/api/synsets/n02103406/").data)
+        assert (body["image_count"], body["subtree_image_count"]) == (2, 3)
+
+        resp = client.delete("/api/synsets/n02103406/hyponyms/n02109047/")
+        assert resp.status_code == 204
+        body = json.loads(client.get(self.RESOURCE_URL).data)
+        assert [(item["synset_wnid"], item["imid"]) for item in body["items"]] == [("n02103406", 9), ("n02103406", 282)]
+        assert body["total"] == 2
+
+        resp = client.get(self.RESOURCE_URL + "?start=first")
+        assert resp.status_code == 400
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+
+    def test_get_pages(self, client):
+        """
+        Add enough images for the collection to span multiple pages.
+        Assert that following the cursor-using next controls returns every image of the subtree exactly once and in order.
+        """
+
+        _populate_db_images(client, 60)
+        _populate_db_images(client, 60, wnid="n02109047")
+
+        items = _walk_pages(client, self.RESOURCE_URL)
+        keys = [(item["synset_wnid"], item["imid"]) for item in items]
+        assert keys == sorted(keys)
+        assert len(keys) == 123
+
+
+class TestSynsetImageBulk(object):
+    """
+    This class contains the resource tests for the SynsetImageBulk resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02109047/images/bulk/"
+    INVALID_URL = "/api/synsets/n00000000/images/bulk/"
+
+    def test_post(self, client, monkeypatch):
+        """
+        Assert that a POST sent to the resource URL fails when using an invalid Content-Type in the request headers.
+        Assert that a POST sent to the invalid URL fails.
+        Assert that a POST sent to the resource URL with NDJSON in the request body succeeds, spanning multiple batches,
+        and that each non-empty line has a result telling whether the image was added, invalid, or already existing.
+        Assert that the added images are in the image collection of the synset and counted in the image counts.
+        """
+
+        monkeypatch.setattr("imagenet_browser.resources.image.IMAGE_BULK_BATCH_SIZE", 2)
+        lines = [
+            json.dumps({"imid": 1, "url": "http://static.flickr.com/1.jpg", "date": "2011-01-01"}),
+            json.dumps({"imid": 11, "url": "http://static.flickr.com/11.jpg"}),
+            "",
+            json.dumps({"imid": 2, "url": "http://static.flickr.com/2.jpg"}),
+            "{not json",
+            json.dumps({"imid": "3", "url": "http://static.flickr.com/3.jpg"}),
+            json.dumps({"imid": 2, "url": "http://static.flickr.com/2.jpg"}),
+            json.dumps({"imid": 4, "url": "http://static.flickr.com/4.jpg"})
+        ]
+        data = "\n".join(lines) + "\n"
+
+        resp = client.post(self.RESOURCE_URL, data=data, content_type="application/json")
+        assert resp.status_code == 415
+
+        resp = client.post(self.INVALID_URL, data=data, content_type="application/x-ndjson")
+        assert resp.status_code == 404
+
+        resp = client.post(self.RESOURCE_URL, data=data, content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        _check_control_get_method("collection", client, body)
+        assert [(result["line"], result["status"]) for result in body["results"]] == [
+            (1, 201), (2, 409), (4, 201), (5, 400), (6, 400), (7, 409), (8, 201)
+        ]
+        assert (body["added"], body["rejected"]) == (3, 4)
+
+        body = json.loads(client.get("/api/synsets/n02109047/images/").data)
+        assert [item["imid"] for item in body["items"]] == [1, 2, 4, 11]
+        assert body["items"][0]["date"] == "2011-01-01"
+        body = json.loads(client.get("/api/synsets/n02103406/").data)
+        assert body["subtree_image_count"] == 6
+
+class TestImageBulk(object):
+    """
+    This class contains the resource tests for the ImageBulk resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/images/bulk/"
+
+    def test_post(self, client):
+        """
+        Assert that a POST sent to the resource URL fails when using an invalid Content-Type in the request headers.
+        Assert that a POST sent to the resource URL with NDJSON in the request body succeeds,
+        and that lines without a WordNet ID are invalid while lines with an unknown WordNet ID are not found.
+        Assert that the added images are counted in the total of the image collection.
+        """
+
+        lines = [
+            json.dumps({"synset_wnid": "n02103406", "imid": 1, "url": "http://static.flickr.com/1.jpg"}),
+            json.dumps({"synset_wnid": "n02109391", "imid": 1, "url": "http://static.flickr.com/1.jpg"}),
+            json.dumps({"imid": 2, "url": "http://static.flickr.com/2.jpg"}),
+            json.dumps({"synset_wnid": "n00000000", "imid": 3, "url": "http://static.flickr.com/3.jpg"})
+        ]
+        data = "\n".join(lines)
+
+        resp = client.post(self.RESOURCE_URL, data=data, content_type="text/plain")
+        assert resp.status_code == 415
+
+        resp = client.post(self.RESOURCE_URL, data=data, content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [result["status"] for result in body["results"]] == [201, 201, 400, 404]
+
+        body = json.loads(client.get("/api/images/").data)
+        assert body["total"] == 5
+        assert ("n02109391", 1) in [(item["synset_wnid"], item["imid"]) for item in body["items"]]
+
+class TestImageExport(object):
+    """
+    This class contains the resource tests for the ImageExport resource.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/images/export/"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL streams all images as NDJSON by default and as CSV if requested,
+        ordered by their WordNet ID and image ID.
+        Assert that the images can be filtered by a synset subtree and by a date range.
+        Assert that the dates of the images are stored zero-padded so that they compare as dates.
+        Assert that an invalid format, a malformed date, or a date that does not exist fails and that an unknown WordNet ID is not found.
+        """
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert resp.mimetype == "application/x-ndjson"
+        rows = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert [(row["synset_wnid"], row["imid"]) for row in rows] == [("n02103406", 9), ("n02103406", 282), ("n02109047", 11)]
+
+        resp = client.get(self.RESOURCE_URL + "?format=csv")
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/csv"
+        lines = resp.data.decode().splitlines()
+        assert lines[0] == "synset_wnid,imid,url,date"
+        assert lines[3] == "n02109047,11,http://farm1.static.flickr.com/123/403783566_7a838f13c2.jpg,"
+
+        resp = client.get(self.RESOURCE_URL + "?wnid=n02109047")
+        assert [json.loads(line)["imid"] for line in resp.data.decode().splitlines()] == [11]
+
+        image = _get_image_json()
+        image["imid"] = 9
+        image["date"] = "2008-6-5"
+        client.put("/api/synsets/n02103406/images/9/", json=image)
+        resp = client.get(self.RESOURCE_URL + "?date_from=2008-01-01&date_to=2008-12-31")
+        assert [json.loads(line) for line in resp.data.decode().splitlines()][0]["date"] == "2008-06-05"
+        resp = client.get(self.RESOURCE_URL + "?date_from=2008-06-01&date_to=2008-06-10")
+        assert [json.loads(line)["imid"] for line in resp.data.decode().splitlines()] == [9]
+        resp = client.get(self.RESOURCE_URL + "?date_to=2007-12-31")
+        assert resp.data == b""
+
+        resp = client.get(self.RESOURCE_URL + "?format=xml")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?date_from=2008")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?date_from=2008-6-5")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?date_to=2008-02-30")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?wnid=n00000000")
+        assert resp.status_code == 404
+
 class TestImageCollection(object):
     """
     This class contains the resource tests for the ImageCollection resource.
@@ -642,3 +1373,250 @@ class TestImageCollection(object):
 
         resp = client.get(self.RESOURCE_URL + "?start=first")
         assert resp.status_code == 400
+
+    def test_get_pages(self, client):
+        """
+        Add enough images for the collection to span multiple pages.
+        Assert that following the cursor-using next controls returns every image exactly once and in order.
+        Assert that a GET sent to the resource URL succeeds when using the starting index, and that the last page has no next control.
+        Assert that the total reflects the number of images.
+        Assert that a GET sent to the resource URL fails when using an invalid cursor.
+        """
+
+        _populate_db_images(client, 120)
+
+        items = _walk_pages(client, self.RESOURCE_URL)
+        keys = [(item["synset_wnid"], item["imid"]) for item in items]
+        assert keys == sorted(keys)
+        assert len(keys) == 123
+
+        resp = client.get(self.RESOURCE_URL + "?start=100")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [(item["synset_wnid"], item["imid"]) for item in body["items"]] == keys[100:]
+        assert "next" not in body["@controls"]
+        assert body["total"] == 123
+
+        resp = client.get(self.RESOURCE_URL + "?after=WyJuMDIxMDM0MDYiXQ")
+        assert resp.status_code == 400
+
+class TestResponseCache(object):
+    """
+    This class contains the resource tests for the response cache shared by the GET handlers.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/api/synsets/n02103406/"
+
+    def test_get(self, client):
+        """
+        Assert that a repeated GET sent to the resource URL is a cache hit that does not query the database,
+        and that it succeeds with no body when using a matching If-None-Match header.
+        Assert that editing a hyponym refreshes the cached hyponym listing of its parent,
+        and that adding an image to the hyponym refreshes the cached subtree image count of the parent.
+        Assert that adding a synset refreshes the cached synset collection.
+        Assert that the hits and misses are counted.
+        """
+
+        client.application.extensions["response_cache"] = ResponseCache(1 << 20)
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.headers["X-Cache"] == "MISS"
+
+        statements = []
+        with client.application.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert resp.headers["X-Cache"] == "HIT"
+        assert statements == []
+        resp = client.get(self.RESOURCE_URL, headers={"If-None-Match": resp.headers["ETag"]})
+        assert resp.status_code == 304
+        assert statements == []
+
+        body = json.loads(client.get(self.RESOURCE_URL + "hyponyms/").data)
+        assert body["items"][0]["words"] == "Great Dane"
+        valid = {"wnid": "n02109047", "words": "great dane", "gloss": "very large powerful smooth-coated breed of dog"}
+        resp = client.put("/api/synsets/n02109047/", json=valid)
+        assert resp.status_code == 204
+        resp = client.get(self.RESOURCE_URL + "hyponyms/")
+        assert resp.headers["X-Cache"] == "MISS"
+        assert json.loads(resp.data)["items"][0]["words"] == "great dane"
+
+        resp = client.post("/api/synsets/n02109047/images/", json=_get_image_json())
+        assert resp.status_code == 201
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.headers["X-Cache"] == "MISS"
+        assert json.loads(resp.data)["subtree_image_count"] == 4
+
+        assert len(json.loads(client.get("/api/synsets/").data)["items"]) == 3
+        resp = client.post("/api/synsets/", json=_get_synset_json())
+        assert resp.status_code == 201
+        resp = client.get("/api/synsets/")
+        assert resp.headers["X-Cache"] == "MISS"
+        assert len(json.loads(resp.data)["items"]) == 4
+
+        stats = client.application.extensions["response_cache"].stats()
+        assert stats["hits"] == 2
+        assert 0 < stats["hit_rate"] < 1
+
+class TestQueryInstrumentation(object):
+    """
+    This class contains the resource tests for the query instrumentation shared by all handlers.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    def test_get(self, client, caplog):
+        """
+        Assert that the Server-Timing header of a response reports the number of queries issued by the handler,
+        and that the handlers of the hyponym item and the synset image collection stay within a few queries.
+        Assert that a warning is logged when a request goes over the query budget of its endpoint, but not when the endpoint has no budget.
+        Assert that a request whose statement fails does not skew the reports of the following requests.
+        """
+
+        statements = []
+        with client.application.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        resp = client.get("/api/synsets/n02103406/hyponyms/n02109047/")
+        assert resp.status_code == 200
+        assert resp.headers["Server-Timing"].startswith("db;dur=")
+        assert 'desc="{} queries"'.format(len(statements)) in resp.headers["Server-Timing"]
+        assert len(statements) <= 3
+
+        resp = client.get("/api/synsets/n02103406/images/")
+        assert 'desc="3 queries"' in resp.headers["Server-Timing"]
+        assert "over the budget" not in caplog.text
+
+        client.application.config["QUERY_BUDGET"] = 1
+        client.get("/api/synsets/n02103406/images/")
+        assert "GET /api/synsets/n02103406/images/? issued 3 queries, over the budget of 1 of endpoint 'api.synsetimagecollection'" in caplog.text
+
+        caplog.clear()
+        client.post("/api/images/bulk/", data=json.dumps({"synset_wnid": "n02109391", "imid": 1, "url": "http://static.flickr.com/1.jpg"}), content_type="application/x-ndjson")
+        assert "over the budget" not in caplog.text
+
+        client.application.config["QUERY_BUDGET"] = 10
+        image = _get_image_json()
+        image["imid"] = 282
+        resp = client.post("/api/synsets/n02103406/images/", json=image)
+        assert resp.status_code == 409
+        resp = client.get("/api/synsets/n02103406/images/")
+        assert 'desc="3 queries"' in resp.headers["Server-Timing"]
+
+class TestMetrics(object):
+    """
+    This class contains the resource tests for the metrics view.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    RESOURCE_URL = "/metrics"
+
+    def test_get(self, client):
+        """
+        Assert that a GET sent to the resource URL exports the requests counted per resource, method, and status code in the Prometheus text format,
+        along with the latency histogram, database time, and response bytes of each resource.
+        Assert that the statistics of the response cache are exported when it is enabled.
+        """
+
+        client.get("/api/synsets/")
+        client.get("/api/synsets/")
+        client.get("/api/synsets/n00000000/")
+        client.get("/api/nothing/")
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/plain"
+        samples = dict(line.rsplit(" ", 1) for line in resp.data.decode().splitlines() if not line.startswith("#"))
+        assert samples['imagenet_browser_requests_total{resource="SynsetCollection",method="GET",status="200"}'] == "2"
+        assert samples['imagenet_browser_requests_total{resource="SynsetItem",method="GET",status="404"}'] == "1"
+        assert samples['imagenet_browser_requests_total{resource="unmatched",method="GET",status="404"}'] == "1"
+        assert samples['imagenet_browser_request_duration_seconds_bucket{resource="SynsetCollection",le="+Inf"}'] == "2"
+        assert samples['imagenet_browser_request_duration_seconds_count{resource="SynsetCollection"}'] == "2"
+        assert float(samples['imagenet_browser_db_duration_seconds_total{resource="SynsetCollection"}']) > 0
+        assert int(samples['imagenet_browser_db_queries_total{resource="SynsetCollection"}']) >= 2
+        assert int(samples['imagenet_browser_response_bytes_total{resource="SynsetCollection"}']) > 0
+        assert "imagenet_browser_response_cache_hits_total" not in samples
+
+        client.application.extensions["response_cache"] = ResponseCache(1 << 20)
+        client.get("/api/synsets/")
+        client.get("/api/synsets/")
+        samples = dict(line.rsplit(" ", 1) for line in client.get(self.RESOURCE_URL).data.decode().splitlines() if not line.startswith("#"))
+        assert samples["imagenet_browser_response_cache_hits_total"] == "1"
+        assert samples["imagenet_browser_response_cache_entries"] == "1"
+
+class TestProfiling(object):
+    """
+    This class contains the resource tests for the profiling middleware.
+    The methods create their own application, as the middleware is installed by the application factory only when profiling is enabled.
+    """
+
+    RESOURCE_URL = "/api/"
+
+    def test_get(self):
+        """
+        Assert that a GET sent to the resource URL is profiled into a pstats file only when it carries the secret header,
+        and that every request is profiled when the sample rate is one.
+        Assert that the middleware is not installed when profiling is disabled.
+        """
+
+        import pstats
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = {
+                "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                "TESTING": True,
+                "PROFILING": True,
+                "PROFILING_SECRET": "secret",
+                "PROFILING_DIR": directory
+            }
+            client = create_app(config).test_client()
+
+            resp = client.get(self.RESOURCE_URL)
+            assert resp.status_code == 200
+            resp = client.get(self.RESOURCE_URL, headers={"X-Profile": "guess"})
+            assert resp.status_code == 200
+            assert os.listdir(directory) == []
+
+            resp = client.get(self.RESOURCE_URL, headers={"X-Profile": "secret"})
+            assert resp.status_code == 200
+            assert "imagenet_browser:synsetcollection" in json.loads(resp.data)["@controls"]
+            fnames = os.listdir(directory)
+            assert len(fnames) == 1 and fnames[0].startswith("GET.api.")
+            stats = pstats.Stats(os.path.join(directory, fnames[0]))
+            assert any(function == "entry_point" for _, _, function in stats.stats)
+
+            config["PROFILING_SAMPLE_RATE"] = 1.0
+            client = create_app(config).test_client()
+            client.get(self.RESOURCE_URL)
+            assert len(os.listdir(directory)) == 2
+
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        assert not isinstance(app.wsgi_app, ProfilerMiddleware)
+
+class TestControlTemplates(object):
+    """
+    This class contains the tests for the control templates shared by the hypermedia responses of all handlers.
+    All methods prefixed with 'test_' that have the 'client' parameter will obtain a test client to a new application,
+    and as such a new database, from the application factory.
+    """
+
+    def test_add_control_from_template(self, client):
+        """
+        Assert that the templates cannot be modified and that modifying a control built from a template leaves the template unchanged,
+        so that the controls of later responses are not affected.
+        """
+
+        with pytest.raises(TypeError):
+            ImagenetBrowserBuilder.CONTROL_TEMPLATES["edit_image"]["title"] = "Changed"
+
+        with client.application.test_request_context():
+            body = ImagenetBrowserBuilder()
+            body.add_control_edit_image("n02103406", 9)
+            body["@controls"]["edit"]["title"] = "Changed"
+            assert ImagenetBrowserBuilder.CONTROL_TEMPLATES["edit_image"]["title"] == "Edit this image"
+            assert body["@controls"]["edit"]["schema"] is Image.get_schema()
@@ -0,0 +1,51 @@
+import json
+from imagenet_browser import create_app
+from imagenet_browser.cache import ResponseCache
+from imagenet_browser.utils import ImagenetBrowserBuilder, JSON_SERIALIZERS, serialize_json
+
+def test_serialize_json():
+    """
+    Tests that every available JSON serializer produces JSON that deserializes back to the hypermedia response body,
+    including non-ASCII strings and nested builders.
+    """
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+    body = ImagenetBrowserBuilder(wnid="n02121620", words="café, true cat", total=2)
+    body.add_control("self", "/api/synsets/n02121620/")
+    body["items"] = [ImagenetBrowserBuilder(imid=9, date=None)]
+    for name in JSON_SERIALIZERS:
+        app.config["JSON_SERIALIZER"] = name
+        with app.app_context():
+            assert json.loads(serialize_json(body)) == body
+
+def test_response_cache():
+    """
+    Tests that the response cache evicts the least recently used responses to stay within its size,
+    that invalidating a tag removes only the responses having it, that a response built before an invalidation is not cached,
+    and that the hits and misses are counted.
+    Also tests that the application factory creates the cache when it is given a size.
+    """
+    cache = ResponseCache(100)
+    cache.put("/a", b"x" * 40, "1", frozenset(["synset:a"]), cache.generation)
+    cache.put("/b", b"x" * 40, "1", frozenset(["synset:b", "synsets"]), cache.generation)
+    assert cache.get("/a") == (b"x" * 40, "1")
+    cache.put("/c", b"x" * 40, "1", frozenset(["synset:c"]), cache.generation)
+    assert cache.get("/b") is None
+    assert cache.get("/a") is not None
+    assert cache.nbytes == 2 * 42
+
+    generation = cache.generation
+    cache.invalidate(["synset:a", "synset:x"])
+    assert cache.get("/a") is None
+    assert cache.get("/c") is not None
+    cache.put("/a", b"x" * 40, "1", frozenset(["synset:a"]), generation)
+    assert cache.get("/a") is None
+    cache.put("/d", b"x" * 200, "1", frozenset(), cache.generation)
+    assert cache.get("/d") is None
+    assert cache.keys_by_tag == {"synset:c": {"/c"}}
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (1, 42, 3, 4)
+    assert stats["hit_rate"] == 3 / 7
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True, "RESPONSE_CACHE_MAX_BYTES": 1024})
+    assert app.extensions["response_cache"].max_bytes == 1024